@@ -1,20 +1,78 @@
 import tkinter as tk
 from tkinter import messagebox
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl
+import argparse
+import asyncio
+import cProfile
+import csv
 import hashlib
+import hmac
 import json
+import multiprocessing
 import os
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import zlib
 
 # Backend Implementation
+# Money is integer cents throughout: balances, transaction amounts and
+# everything persisted. Floats only appear when reading older data files.
+AMOUNT_PATTERN = re.compile(r"([+-]?)(\d*)(?:\.(\d{0,2}))?")
+# Far inside the signed 64-bit columns history is stored in, even summed
+# over millions of postings.
+MAX_AMOUNT_CENTS = 10 ** 12
+
+def parse_amount(text):
+    match = AMOUNT_PATTERN.fullmatch(str(text).strip().lstrip("$"))
+    if match is None or not (match.group(2) or match.group(3)):
+        raise ValueError("Amount must be a number with at most two decimal places")
+    sign, whole, fraction = match.groups()
+    cents = int(whole or 0) * 100 + int((fraction or "").ljust(2, "0"))
+    if cents > MAX_AMOUNT_CENTS:
+        raise ValueError(f"Amount must be at most {format_cents(MAX_AMOUNT_CENTS)}")
+    return -cents if sign == "-" else cents
+
+def to_cents(dollars):
+    return round(dollars * 100)
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}${cents // 100}.{cents % 100:02d}"
+
+def cents_field(data, name):
+    # Files written before amounts became integer cents carry float dollars
+    # under the bare name.
+    key = f"{name}_cents"
+    return data[key] if key in data else to_cents(data[name])
+
+def check_cents(amount):
+    if not isinstance(amount, int) or isinstance(amount, bool):
+        raise TypeError("Amounts must be integer cents")
+    if abs(amount) > MAX_AMOUNT_CENTS:
+        raise ValueError(f"Amount must be at most {format_cents(MAX_AMOUNT_CENTS)}")
+
 class Account:
-    def __init__(self, account_number, owner, balance=0.0, account_type="Savings"):
+    def __init__(self, account_number, owner, balance=0, account_type="Savings"):
         self.account_number = account_number
         self.owner = owner
         self.balance = balance
         self.account_type = account_type
-        self.transactions = []
+        self.transactions = TransactionStore(account_number, opening_balance=balance)
     
     def deposit(self, amount):
+        check_cents(amount)
         if amount <= 0:
             raise ValueError("Deposit amount must be positive")
         self.balance += amount
@@ -23,6 +81,7 @@ class Account:
         return transaction
     
     def withdraw(self, amount):
+        check_cents(amount)
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive")
         if self.balance < amount:
@@ -33,6 +92,7 @@ class Account:
         return transaction
     
     def transfer(self, amount, recipient_account):
+        check_cents(amount)
         if amount <= 0:
             raise ValueError("Transfer amount must be positive")
         if self.balance < amount:
@@ -49,13 +109,60 @@ class Account:
         return transaction_out, transaction_in
     
     def get_transaction_history(self):
-        return self.transactions
+        return TransactionView(self.transactions)
+    
+    def get_transaction_range(self, start, stop):
+        return TransactionView(self.transactions, max(start, 0), max(stop, 0))
+    
+    def get_transaction_page(self, page, page_size=50):
+        return self.get_transaction_range(page * page_size, (page + 1) * page_size)
+    
+    def query_transactions(self, start=None, end=None, transaction_type=None, related_account=None,
+                           min_amount=None, max_amount=None):
+        positions = self.transactions.query(start, end, transaction_type, related_account,
+                                            min_amount, max_amount)
+        return [self.transactions[i] for i in positions]
     
     def get_balance(self):
         return self.balance
-
+    
+    def restore_opening_balance(self, opening_balance):
+        # For accounts read back from storage: opening plus the running
+        # column must land on the stored balance, which is an O(1) check
+        # rather than a replay. A mismatch is reported, never absorbed into
+        # the opening balance, so reconcile still sees it.
+        self.transactions.opening_balance = opening_balance
+        if self.transactions.closing_balance() != self.balance:
+            print(f"Warning: account {self.account_number} balance "
+                  f"{format_cents(self.balance)} does not match its history "
+                  f"({format_cents(self.transactions.closing_balance())})")
+    
+    def balance_at(self, when):
+        # Balance including every transaction up to and including `when`.
+        return self.transactions.balance_at(when, inclusive=True)
+    
+    def balance_before(self, when):
+        return self.transactions.balance_at(when, inclusive=False)
+    
+    def closing_balance(self, day):
+        return self.balance_at(datetime.combine(day, datetime.max.time()))
+    
+    def daily_closing_balances(self, first_day, last_day):
+        days = (last_day - first_day).days + 1
+        return [(first_day + timedelta(days=n), self.closing_balance(first_day + timedelta(days=n)))
+                for n in range(days)]
+    
+    def statement(self, start, end):
+        # start inclusive, end exclusive, matching query_transactions.
+        return {
+            "account_number": self.account_number,
+            "opening_balance": self.balance_before(start),
+            "closing_balance": self.balance_before(end),
+            "transactions": self.query_transactions(start=start, end=end)
+        }
+    
     def __str__(self):
-        return f"Account {self.account_number} (Balance: ${self.balance:.2f})"
+        return f"Account {self.account_number} (Balance: {format_cents(self.balance)})"
 
 class Customer:
     def __init__(self, customer_id, name, email, phone):
@@ -64,176 +171,2506 @@ class Customer:
         self.email = email
         self.phone = phone
         self.accounts = []
+        self._accounts_by_number = {}
     
     def add_account(self, account):
         self.accounts.append(account)
+        self._accounts_by_number[account.account_number] = account
     
     def get_account(self, account_number):
-        for account in self.accounts:
-            if account.account_number == account_number:
-                return account
-        return None
+        return self._accounts_by_number.get(account_number)
     
     def get_all_accounts(self):
         return self.accounts
+    
+    def copy(self):
+        # Detached copy with its own history columns. Copying arrays is cheap
+        # enough to do under the bank's locks; turning them into JSON is not.
+        customer = Customer(self.customer_id, self.name, self.email, self.phone)
+        for account in self.accounts:
+            account_copy = Account(account.account_number, customer, account.balance, account.account_type)
+            account_copy.transactions = account.transactions.copy()
+            customer.add_account(account_copy)
+        return customer
 
 class Transaction:
-    def __init__(self, amount, transaction_type, account_number, related_account=None):
+    __slots__ = ("amount", "transaction_type", "timestamp", "account_number", "related_account")
+    
+    def __init__(self, amount, transaction_type, account_number, related_account=None, timestamp=None):
         self.amount = amount
         self.transaction_type = transaction_type
-        self.timestamp = datetime.now()
+        self.timestamp = datetime.now() if timestamp is None else timestamp
         self.account_number = account_number
         self.related_account = related_account
     
     def __str__(self):
         return (f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {self.transaction_type}: "
-                f"${self.amount:.2f} (Account: {self.account_number})")
+                f"{format_cents(self.amount)} (Account: {self.account_number})")
 
-class Bank:
+TRANSACTION_TYPES = ("Deposit", "Withdrawal", "Transfer In", "Transfer Out")
+TRANSACTION_TYPE_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+CREDIT_TYPE_CODES = frozenset((TRANSACTION_TYPE_CODES["Deposit"], TRANSACTION_TYPE_CODES["Transfer In"]))
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+class AccountIds:
+    # Interns account numbers to small integers so transaction columns can
+    # reference related accounts without holding a string per row.
     def __init__(self):
-        self.customers = []
-        self.accounts = []
-        self.load_data()
+        self.numbers = []
+        self.codes = {}
+        self._lock = threading.Lock()
     
-    def add_customer(self, customer):
-        self.customers.append(customer)
-        for account in customer.accounts:
-            self.accounts.append(account)
-        self.save_data()
-    
-    def find_customer(self, customer_id):
-        for customer in self.customers:
-            if customer.customer_id == customer_id:
-                return customer
+    def intern(self, account_number):
+        if account_number is None:
+            return -1
+        code = self.codes.get(account_number)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(account_number)
+                if code is None:
+                    code = len(self.numbers)
+                    self.numbers.append(account_number)
+                    self.codes[account_number] = code
+        return code
+    
+    def lookup(self, code):
+        return None if code < 0 else self.numbers[code]
+
+ACCOUNT_IDS = AccountIds()
+
+class TransactionStore(Sequence):
+    # Column-oriented history for one account: amount in cents, a type code,
+    # epoch microseconds and an interned related account per transaction.
+    # Transaction objects are only built when a row is read. A running-balance
+    # column (cumulative net change since opening_balance) makes the balance
+    # after any row an O(1) read and at any time an O(log n) bisect.
+    def __init__(self, account_number, opening_balance=0):
+        self.account_number = account_number
+        self.opening_balance = opening_balance
+        self.amounts = array("q")
+        self.net = array("q")
+        self.types = array("b")
+        self.timestamps = array("q")
+        self.related = array("i")
+        # Positions of each transaction type, in append order.
+        self.positions_by_type = {code: array("q") for code in range(len(TRANSACTION_TYPES))}
+        # History is appended in time order, so the timestamp column can be
+        # bisected; a clock step backwards clears this and queries scan.
+        self.time_ordered = True
+    
+    def add(self, amount, transaction_type, timestamp, related_account=None):
+        code = TRANSACTION_TYPE_CODES[transaction_type]
+        micros = (timestamp - EPOCH) // MICROSECOND
+        if self.timestamps and micros < self.timestamps[-1]:
+            self.time_ordered = False
+        self.positions_by_type[code].append(len(self.amounts))
+        signed = amount if code in CREDIT_TYPE_CODES else -amount
+        self.net.append(self.net[-1] + signed if self.net else signed)
+        self.types.append(code)
+        self.timestamps.append(micros)
+        self.related.append(ACCOUNT_IDS.intern(related_account))
+        # amounts is what len() counts, so it grows last: a reader on another
+        # thread never sees a row whose other columns are not there yet.
+        self.amounts.append(amount)
+    
+    def net_change(self):
+        return self.net[-1] if self.net else 0
+    
+    def closing_balance(self):
+        return self.opening_balance + self.net_change()
+    
+    def balance_after(self, index):
+        return self.opening_balance + self.net[index]
+    
+    def balance_at(self, when, inclusive=True):
+        micros = (when - EPOCH) // MICROSECOND
+        if self.time_ordered:
+            position = (bisect_right if inclusive else bisect_left)(self.timestamps, micros)
+            return self.opening_balance + (self.net[position - 1] if position else 0)
+        balance = self.opening_balance
+        for i, timestamp in enumerate(self.timestamps):
+            if timestamp < micros or (inclusive and timestamp == micros):
+                balance += self.amounts[i] if self.types[i] in CREDIT_TYPE_CODES else -self.amounts[i]
+        return balance
+    
+    def query(self, start=None, end=None, transaction_type=None, related_account=None,
+              min_amount=None, max_amount=None):
+        # start is inclusive and end exclusive. Returns matching positions.
+        lo, hi = 0, len(self.amounts)
+        start_micros = None if start is None else (start - EPOCH) // MICROSECOND
+        end_micros = None if end is None else (end - EPOCH) // MICROSECOND
+        if self.time_ordered:
+            if start_micros is not None:
+                lo = bisect_left(self.timestamps, start_micros)
+            if end_micros is not None:
+                hi = bisect_left(self.timestamps, end_micros)
+            start_micros = end_micros = None
+        
+        if transaction_type is not None:
+            positions = self.positions_by_type[TRANSACTION_TYPE_CODES[transaction_type]]
+            candidates = positions[bisect_left(positions, lo):bisect_left(positions, hi)]
+        else:
+            candidates = range(lo, hi)
+        
+        related_code = None
+        if related_account is not None:
+            related_code = ACCOUNT_IDS.codes.get(related_account)
+            if related_code is None:
+                return []
+        
+        if (start_micros is None and end_micros is None and related_code is None
+                and min_amount is None and max_amount is None):
+            return list(candidates)
+        
+        timestamps, related, amounts = self.timestamps, self.related, self.amounts
+        return [
+            i for i in candidates
+            if (start_micros is None or timestamps[i] >= start_micros)
+            and (end_micros is None or timestamps[i] < end_micros)
+            and (related_code is None or related[i] == related_code)
+            and (min_amount is None or amounts[i] >= min_amount)
+            and (max_amount is None or amounts[i] <= max_amount)
+        ]
+    
+    def copy(self):
+        store = TransactionStore(self.account_number, self.opening_balance)
+        store.amounts = self.amounts[:]
+        store.net = self.net[:]
+        store.types = self.types[:]
+        store.timestamps = self.timestamps[:]
+        store.related = self.related[:]
+        store.positions_by_type = {code: positions[:] for code, positions in self.positions_by_type.items()}
+        store.time_ordered = self.time_ordered
+        return store
+    
+    def truncate(self, length):
+        # Drops rows from the end, e.g. postings that could not be persisted.
+        # amounts shrinks first, the reverse of add().
+        del self.amounts[length:]
+        del self.net[length:]
+        del self.types[length:]
+        del self.timestamps[length:]
+        del self.related[length:]
+        for positions in self.positions_by_type.values():
+            del positions[bisect_left(positions, length):]
+    
+    def append(self, transaction):
+        self.add(transaction.amount, transaction.transaction_type,
+                 transaction.timestamp, transaction.related_account)
+    
+    def __len__(self):
+        return len(self.amounts)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return Transaction(
+            self.amounts[index],
+            TRANSACTION_TYPES[self.types[index]],
+            self.account_number,
+            ACCOUNT_IDS.lookup(self.related[index]),
+            EPOCH + self.timestamps[index] * MICROSECOND
+        )
+
+class TransactionView(Sequence):
+    # Read-only window over a TransactionStore; rows are materialized lazily
+    # and slicing returns another view rather than a copy.
+    def __init__(self, store, start=0, stop=None):
+        self.store = store
+        self.start = start
+        self.stop = stop
+    
+    def _bounds(self):
+        stop = len(self.store) if self.stop is None else min(self.stop, len(self.store))
+        return self.start, max(stop, self.start)
+    
+    def __len__(self):
+        start, stop = self._bounds()
+        return stop - start
+    
+    def __getitem__(self, index):
+        start, stop = self._bounds()
+        if isinstance(index, slice):
+            first, last, step = index.indices(stop - start)
+            if step != 1:
+                return [self[i] for i in range(first, last, step)]
+            return TransactionView(self.store, start + first, start + max(last, first))
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError("transaction index out of range")
+        return self.store[start + index]
+
+class TransactionJournal:
+    def __init__(self, path="bank_journal.log"):
+        self.path = path
+        self.seq = 0
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._repaired = False
+    
+    def repair(self):
+        # A crash mid-append leaves a final line without its newline. That
+        # append was never acknowledged, so it is cut off before anything
+        # else is written; otherwise the next record would be glued onto it.
+        with self._lock:
+            self._repair()
+    
+    def _repair(self):
+        trim_torn_tail(self.path)
+        self._repaired = True
+    
+    def append(self, transactions):
+        return self.append_records({
+            "amount_cents": t.amount,
+            "transaction_type": t.transaction_type,
+            "timestamp": t.timestamp.isoformat(),
+            "account_number": t.account_number,
+            "related_account": t.related_account
+        } for t in transactions)
+    
+    def append_records(self, records):
+        with self._lock:
+            if not self._repaired:
+                self._repair()
+            lines = []
+            for record in records:
+                self.seq += 1
+                lines.append(json.dumps({"seq": self.seq, **record}))
+            with open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending += len(lines)
+            return self.pending
+    
+    def replay(self, after_seq=0):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn line means the process died mid-append; the
+                    # operation was never acknowledged, so it is dropped.
+                    # Journals written before tails were repaired can have one
+                    # glued to the next record, so later lines still count.
+                    continue
+                self.seq = max(self.seq, record["seq"])
+                if record["seq"] > after_seq:
+                    self.pending += 1
+                    yield record
+    
+    def truncate(self, upto_seq):
+        with self._lock:
+            kept = []
+            for line in self._read_lines():
+                try:
+                    if json.loads(line)["seq"] > upto_seq:
+                        kept.append(line)
+                except ValueError:
+                    # Torn, as in replay(); it is not carried over.
+                    pass
+            write_atomic(self.path, "".join(kept))
+            self.pending = len(kept)
+    
+    def _read_lines(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            return [line for line in f if line.endswith("\n")]
+
+def iter_journal_transactions(journal_file, after_seq=0):
+    # Transaction records from the journal tail, including any history that
+    # arrived with a journaled customer or account.
+    for record in TransactionJournal(journal_file).replay(after_seq):
+        if "customer" in record:
+            for account_data in record["customer"]["accounts"]:
+                yield from account_data.get("transactions", [])
+        else:
+            yield record
+
+class JsonStream:
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+    
+    def _fill(self):
+        # Read at least as much as is already buffered so that re-parsing a
+        # value larger than one chunk stays linear overall. The indentation
+        # in front of pos is kept for _pretty_run.
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            return False
+        keep = self.buffer.rfind("\n", max(self.pos - 256, 0), self.pos)
+        keep = self.pos if keep < 0 else keep
+        self.buffer = self.buffer[keep:] + chunk
+        self.pos -= keep
+        return True
+    
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the current buffer")
+        self.pos += 1
+    
+    def value(self, raw=False):
+        # With raw=True the value's JSON text is returned instead, e.g. to
+        # hand it to another process to parse.
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends exactly at the buffer edge may continue in
+            # the next chunk.
+            if end == len(self.buffer) and self._fill():
+                continue
+            start, self.pos = self.pos, end
+            return self.buffer[start:end] if raw else value
+    
+    def raw_run(self, max_chars):
+        # JSON text of one or more consecutive elements of the array being
+        # read, comma separated and about max_chars long at most, for
+        # json.loads("[" + text + "]") elsewhere. The stream is left on
+        # whatever follows the last of them.
+        text = self._pretty_run(max_chars)
+        if text is not None:
+            return text
+        texts = [self.value(raw=True)]
+        size = len(texts[0])
+        while size < max_chars and self.peek() == ",":
+            self.pos += 1
+            texts.append(self.value(raw=True))
+            size += len(texts[-1])
+        return ",".join(texts)
+    
+    def _pretty_run(self, max_chars):
+        # Pretty-printed JSON, as every snapshot is written, closes a
+        # non-empty container on a line of its own at the indentation its
+        # opening line had, and a string cannot hold a raw newline. Inside an
+        # array of such containers, each closing line at the elements'
+        # indentation ends an element, so a run is cut with one rfind and
+        # nothing is decoded. Returns None for any other layout.
+        if self.peek() not in ("{", "["):
+            return None
+        while len(self.buffer) - self.pos < max_chars and self._fill():
+            pass
+        line_start = self.buffer.rfind("\n", 0, self.pos)
+        indent = self.buffer[line_start + 1:self.pos]
+        if line_start < 0 or indent.strip(" \t") or self.buffer[self.pos + 1:self.pos + 2] != "\n":
+            return None
+        closing = "\n" + indent + ("}" if self.buffer[self.pos] == "{" else "]")
+        end = self.buffer.rfind(closing, self.pos, self.pos + max_chars)
+        # An element longer than max_chars makes a run of its own.
+        searched = 0
+        while end < 0:
+            end = self.buffer.find(closing, self.pos + searched)
+            if end < 0:
+                searched = max(len(self.buffer) - len(closing) - self.pos, 0)
+                if not self._fill():
+                    raise ValueError(f"Unterminated JSON value at offset {self.pos} of the current buffer")
+        start, self.pos = self.pos, end + len(closing)
+        return self.buffer[start:self.pos]
+
+def iter_customer_records(f, header=None, batch_chars=None):
+    # Yields the entries of the top-level "customers" array one by one; any
+    # other top-level keys are collected into header once they are read.
+    # With batch_chars, yields the JSON text of runs of consecutive entries
+    # instead (see JsonStream.raw_run).
+    stream = JsonStream(f)
+    if stream.peek() == "":
+        return
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "customers":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value() if batch_chars is None else stream.raw_run(batch_chars)
+                    if stream.peek() == "]":
+                        stream.pos += 1
+                        break
+                    stream.expect(",")
+        else:
+            value = stream.value()
+            if header is not None:
+                header[key] = value
+        if stream.peek() == "}":
+            return
+        stream.expect(",")
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_snapshot(path, journal_seq, customers):
+    # Atomically writes {"journal_seq": ..., "customers": [...]} in exactly
+    # the layout of json.dumps(indent=4), which reconcile relies on, but
+    # streamed: only one customer's dict tree exists at a time.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(f'{{\n    "journal_seq": {json.dumps(journal_seq)},\n    "customers": [')
+        separator = "\n        "
+        for customer_data in customers:
+            f.write(separator)
+            f.write(json.dumps(customer_data, indent=4).replace("\n", "\n        "))
+            separator = ",\n        "
+        f.write("]\n}" if separator == "\n        " else "\n    ]\n}")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def trim_torn_tail(path, block_size=1 << 16):
+    # Cuts an append-only, newline-terminated file back to its last complete
+    # line. Only the end of the file is read.
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+            f.flush()
+            os.fsync(f.fileno())
+
+class PersistenceWorker:
+    # Runs save() on a background thread. mark_dirty() is cheap enough to
+    # call on every change; the thread coalesces marks into one save once no
+    # new mark has arrived for `delay` seconds, or `max_delay` after the
+    # first unsaved one. flush() is the durability barrier: it returns once
+    # everything marked before the call has been saved. stop() flushes and
+    # ends the thread.
+    def __init__(self, save, delay=0.5, max_delay=5.0):
+        self.save = save
+        self.delay = delay
+        self.max_delay = max_delay
+        self._condition = threading.Condition()
+        self._marked = 0
+        self._saved = 0
+        self._first_mark = None
+        self._last_mark = None
+        self._flushing = False
+        self._failures = 0
+        self._error = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self._thread.start()
+    
+    def mark_dirty(self):
+        with self._condition:
+            self._marked += 1
+            self._last_mark = time.monotonic()
+            if self._first_mark is None:
+                self._first_mark = self._last_mark
+            self._condition.notify_all()
+    
+    def flush(self):
+        with self._condition:
+            target = self._marked
+            if self._saved >= target:
+                return
+            failures = self._failures
+            self._flushing = True
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self._saved >= target or self._failures > failures)
+            if self._saved < target:
+                raise self._error
+    
+    def stop(self):
+        # The thread ends even if the final save fails; the error is raised.
+        try:
+            self.flush()
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+            self._thread.join()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._saved < self._marked or self._stopped)
+                if self._stopped:
+                    return
+                while not self._flushing and not self._stopped:
+                    deadline = min(self._last_mark + self.delay, self._first_mark + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopped:
+                    return
+                target = self._marked
+                self._first_mark = None
+                self._flushing = False
+            
+            try:
+                self.save()
+            except Exception as e:
+                # Whatever went wrong, the thread stays alive and flush()
+                # callers are woken with the error instead of waiting forever.
+                print(f"Error saving data: {e}")
+                with self._condition:
+                    # Retry after another quiet period rather than spinning.
+                    self._failures += 1
+                    self._error = e
+                    self._last_mark = self._first_mark = time.monotonic()
+                    self._condition.notify_all()
+                continue
+            
+            with self._condition:
+                self._saved = max(self._saved, target)
+                self._condition.notify_all()
+
+class JsonStorage:
+    # bank_data.json snapshot plus an append-only journal of transactions
+    # and new customers committed since the snapshot was written. Snapshots
+    # are written by a background PersistenceWorker, so callers only ever
+    # wait for a journal append.
+    def __init__(self, data_file="bank_data.json", journal_file="bank_journal.log", compact_every=1000,
+                 save_delay=0.5, max_save_delay=5.0):
+        self.data_file = data_file
+        self.journal = TransactionJournal(journal_file)
+        self.compact_every = compact_every
+        self.save_delay = save_delay
+        self.max_save_delay = max_save_delay
+        self._saver = None
+        self._saver_lock = threading.Lock()
+    
+    def load(self, bank):
+        # Bulk path: build the whole model, index it once and write nothing.
+        # Going through add_customer here would rewrite the file per customer.
+        snapshot_seq = 0
+        if os.path.exists(self.data_file):
+            try:
+                # Customers are parsed and turned into objects one at a time,
+                # so only a single customer's dict tree is alive at once.
+                header = {}
+                with open(self.data_file, "r") as f:
+                    bank._register_customers(
+                        self._customer_from_dict(customer_data)
+                        for customer_data in iter_customer_records(f, header)
+                    )
+                snapshot_seq = header.get("journal_seq", 0)
+                self.journal.seq = snapshot_seq
+            except Exception as e:
+                print(f"Error loading data: {e}")
+                return
+        
+        try:
+            self.journal.repair()
+            for record in self.journal.replay(snapshot_seq):
+                self._apply_journal_record(bank, record)
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+    
+    def save(self, bank):
+        # Only copies are taken with the bank exclusive; serializing and
+        # writing them runs while postings carry on.
+        with bank.exclusive():
+            seq = self.journal.seq
+            customers = [customer.copy() for customer in bank.customers]
+        
+        write_snapshot(self.data_file, seq, (self._customer_to_dict(customer) for customer in customers))
+        
+        # Only records already folded into the snapshot are dropped; anything
+        # appended while it was being written stays in the journal tail.
+        self.journal.truncate(seq)
+    
+    def save_customer(self, bank, customer, accounts=None):
+        self.journal.append_records([{"customer": self._customer_to_dict(customer, accounts)}])
+        self._saver_for(bank).mark_dirty()
+    
+    def record_transactions(self, bank, transactions):
+        if self.journal.append(transactions) >= self.compact_every:
+            self._saver_for(bank).mark_dirty()
+    
+    def flush(self):
+        if self._saver is not None:
+            self._saver.flush()
+    
+    def close(self):
+        # Saves what is still pending and stops the background worker, e.g.
+        # before the files' directory goes away. A later change starts a new
+        # one.
+        with self._saver_lock:
+            saver, self._saver = self._saver, None
+        if saver is not None:
+            saver.stop()
+    
+    def load_missing(self, bank, customer_id=None, account_number=None):
+        # Everything was loaded up front, so a miss is a real miss.
+        pass
+    
+    def all_resident(self):
+        return True
+    
+    def largest_eviction_group(self):
+        # None: this storage never evicts.
         return None
     
-    def find_account(self, account_number):
-        for account in self.accounts:
-            if account.account_number == account_number:
-                return account
+    def eviction_group(self, bank, customer):
+        # One file: a dropped customer could only come back with a full reload.
         return None
     
-    def save_data(self):
-        data = {
-            "customers": [
+    def evict(self, bank, customers):
+        pass
+    
+    def _saver_for(self, bank):
+        with self._saver_lock:
+            if self._saver is None:
+                self._saver = PersistenceWorker(lambda: self.save(bank), self.save_delay, self.max_save_delay)
+            return self._saver
+    
+    def iter_transactions(self, account_numbers=None, start=None, end=None):
+        # Streams (account_number, epoch micros, type, amount cents, related
+        # account) rows straight from the snapshot and journal tail without
+        # building the object model. start is inclusive and end exclusive.
+        wanted = self._row_filter(account_numbers, start, end)
+        header = {}
+        yield from self._snapshot_rows(self.data_file, header, account_numbers, wanted)
+        for record in iter_journal_transactions(self.journal.path, header.get("journal_seq", 0)):
+            row = self._journal_row(record)
+            if wanted(row[0], row[1]):
+                yield row
+    
+    def _row_filter(self, account_numbers, start, end):
+        start_micros = None if start is None else (start - EPOCH) // MICROSECOND
+        end_micros = None if end is None else (end - EPOCH) // MICROSECOND
+        
+        def wanted(account_number, micros):
+            return ((account_numbers is None or account_number in account_numbers)
+                    and (start_micros is None or micros >= start_micros)
+                    and (end_micros is None or micros < end_micros))
+        return wanted
+    
+    def _snapshot_rows(self, path, header, account_numbers, wanted):
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            for customer_data in iter_customer_records(f, header):
+                for account_data in customer_data.get("accounts", []):
+                    account_number = account_data["account_number"]
+                    if account_numbers is not None and account_number not in account_numbers:
+                        continue
+                    for transaction_data in account_data.get("transactions", []):
+                        micros = (datetime.fromisoformat(transaction_data["timestamp"]) - EPOCH) // MICROSECOND
+                        if wanted(account_number, micros):
+                            yield (account_number, micros, transaction_data["transaction_type"],
+                                   cents_field(transaction_data, "amount"),
+                                   transaction_data.get("related_account"))
+    
+    def _journal_row(self, record):
+        return (record["account_number"], (datetime.fromisoformat(record["timestamp"]) - EPOCH) // MICROSECOND,
+                record["transaction_type"], cents_field(record, "amount"), record.get("related_account"))
+    
+    def _customer_to_dict(self, customer, accounts=None):
+        return {
+            "customer_id": customer.customer_id,
+            "name": customer.name,
+            "email": customer.email,
+            "phone": customer.phone,
+            "accounts": [
                 {
-                    "customer_id": customer.customer_id,
-                    "name": customer.name,
-                    "email": customer.email,
-                    "phone": customer.phone,
-                    "accounts": [
+                    "account_number": account.account_number,
+                    "balance_cents": account.balance,
+                    "opening_balance_cents": account.transactions.opening_balance,
+                    "account_type": account.account_type,
+                    "transactions": [
                         {
-                            "account_number": account.account_number,
-                            "balance": account.balance,
-                            "account_type": account.account_type,
-                            "transactions": [
-                                {
-                                    "amount": t.amount,
-                                    "transaction_type": t.transaction_type,
-                                    "timestamp": t.timestamp.isoformat(),
-                                    "account_number": t.account_number,
-                                    "related_account": t.related_account
-                                } for t in account.transactions
-                            ]
-                        } for account in customer.accounts
+                            "amount_cents": t.amount,
+                            "transaction_type": t.transaction_type,
+                            "timestamp": t.timestamp.isoformat(),
+                            "account_number": t.account_number,
+                            "related_account": t.related_account
+                        } for t in account.transactions
                     ]
-                } for customer in self.customers
+                } for account in (customer.accounts if accounts is None else accounts)
             ]
         }
+    
+    def _customer_from_dict(self, customer_data):
+        customer = Customer(
+            customer_data["customer_id"],
+            customer_data["name"],
+            customer_data["email"],
+            customer_data["phone"]
+        )
         
-        with open("bank_data.json", "w") as f:
-            json.dump(data, f, indent=4)
+        for account_data in customer_data.get("accounts", []):
+            account = Account(
+                account_data["account_number"],
+                customer,
+                cents_field(account_data, "balance"),
+                account_data.get("account_type", "Savings")
+            )
+            
+            for transaction_data in account_data.get("transactions", []):
+                account.transactions.add(
+                    cents_field(transaction_data, "amount"),
+                    transaction_data["transaction_type"],
+                    datetime.fromisoformat(transaction_data["timestamp"]),
+                    transaction_data.get("related_account")
+                )
+            
+            # Older files have no opening balance; their accounts opened at 0.
+            account.restore_opening_balance(account_data.get("opening_balance_cents", 0))
+            
+            customer.add_account(account)
+        
+        return customer
     
-    def load_data(self):
-        if not os.path.exists("bank_data.json"):
+    def _apply_journal_record(self, bank, record):
+        if "customer" in record:
+            # A new customer, or new accounts for an existing one.
+            customer = self._customer_from_dict(record["customer"])
+            existing = bank.find_customer(customer.customer_id)
+            if existing is None:
+                bank._register_customers([customer])
+                return
+            for account in customer.accounts:
+                if bank.find_account(account.account_number) is None:
+                    account.owner = existing
+                    existing.add_account(account)
+                    bank._index_account(account)
             return
         
+        account = bank.find_account(record["account_number"])
+        if account is None:
+            raise ValueError(f"Journal references unknown account {record['account_number']}")
+        
+        amount = cents_field(record, "amount")
+        if record["transaction_type"] in ("Deposit", "Transfer In"):
+            account.balance += amount
+        else:
+            account.balance -= amount
+        
+        account.transactions.add(
+            amount,
+            record["transaction_type"],
+            datetime.fromisoformat(record["timestamp"]),
+            record.get("related_account")
+        )
+
+class ShardedStorage(JsonStorage):
+    # Customers are partitioned by crc32(customer_id) across shard-NNN.json
+    # files in `directory`, each next to a shard-NNN.index.json listing the
+    # accounts it holds. Only the indexes are read at startup; a shard is
+    # parsed the first time find_customer or find_account misses on
+    # something it holds, and a snapshot rewrites only the shards that
+    # changed. All shards share one journal, so a transfer between shards
+    # is still a single append.
+    def __init__(self, directory="bank_shards", shards=16, compact_every=1000, save_delay=0.5,
+                 max_save_delay=5.0, preload=False):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(None, os.path.join(directory, "journal.log"), compact_every, save_delay, max_save_delay)
+        self.directory = directory
+        # The shard count is fixed once a directory has data in it.
+        layout_file = os.path.join(directory, "layout.json")
+        if os.path.exists(layout_file):
+            with open(layout_file, "r") as f:
+                shards = json.load(f)["shards"]
+        else:
+            write_atomic(layout_file, json.dumps({"shards": shards}))
+        self.shards = shards
+        self.preload = preload
+        self._account_shards = {}
+        self._loaded = set()
+        self._loading = set()
+        self._dirty = set()
+        # Shard files are only written with _write_lock held, and never with
+        # a journal_seq older than the one already on disk (_written_seqs).
+        self._write_lock = threading.Lock()
+        self._written_seqs = {}
+        # Customer ids per shard, for sizing the cache. Indexes written
+        # before they listed customers count their accounts instead.
+        self._shard_customers = {}
+    
+    def _path(self, shard, suffix=".json"):
+        return os.path.join(self.directory, f"shard-{shard:03d}{suffix}")
+    
+    def shard_of(self, customer_id):
+        return zlib.crc32(str(customer_id).encode()) % self.shards
+    
+    def load(self, bank):
         try:
-            with open("bank_data.json", "r") as f:
-                data = json.load(f)
-                
-                for customer_data in data.get("customers", []):
-                    customer = Customer(
-                        customer_data["customer_id"],
-                        customer_data["name"],
-                        customer_data["email"],
-                        customer_data["phone"]
-                    )
-                    
-                    for account_data in customer_data.get("accounts", []):
-                        account = Account(
-                            account_data["account_number"],
-                            customer,
-                            account_data["balance"],
-                            account_data.get("account_type", "Savings")
-                        )
-                        
-                        for transaction_data in account_data.get("transactions", []):
-                            transaction = Transaction(
-                                transaction_data["amount"],
-                                transaction_data["transaction_type"],
-                                transaction_data["account_number"],
-                                transaction_data.get("related_account")
-                            )
-                            transaction.timestamp = datetime.fromisoformat(transaction_data["timestamp"])
-                            account.transactions.append(transaction)
-                        
-                        customer.add_account(account)
-                    
-                    self.add_customer(customer)
+            self.journal.repair()
+            for shard, index in self._read_indexes():
+                # New journal records must number past every snapshot.
+                self.journal.seq = max(self.journal.seq, index["journal_seq"])
+                self._written_seqs[shard] = index["journal_seq"]
+                self._shard_customers[shard] = set(index.get("customers", index["accounts"]))
+                for account_number in index["accounts"]:
+                    self._account_shards[account_number] = shard
+            
+            # Shards with journal records newer than their snapshot load now,
+            # so every record a later snapshot truncates belongs to a shard
+            # that snapshot rewrote.
+            tail = {}
+            for record in self.journal.replay():
+                if "customer" in record:
+                    shard = self.shard_of(record["customer"]["customer_id"])
+                    self._shard_customers.setdefault(shard, set()).add(record["customer"]["customer_id"])
+                    for account_data in record["customer"]["accounts"]:
+                        self._account_shards[account_data["account_number"]] = shard
+                else:
+                    shard = self._account_shards.get(record["account_number"])
+                    if shard is None:
+                        raise ValueError(f"Journal references unknown account {record['account_number']}")
+                tail.setdefault(shard, []).append(record)
+            
+            self._load_shards(bank, range(self.shards) if self.preload else sorted(tail), tail)
         except Exception as e:
             print(f"Error loading data: {e}")
+    
+    def _read_indexes(self):
+        for shard in range(self.shards):
+            if os.path.exists(self._path(shard, ".index.json")):
+                with open(self._path(shard, ".index.json"), "r") as f:
+                    yield shard, json.load(f)
+    
+    def load_missing(self, bank, customer_id=None, account_number=None):
+        shard = self.shard_of(customer_id) if customer_id is not None else self._account_shards.get(account_number)
+        if shard is not None and shard not in self._loaded:
+            self._load_shards(bank, [shard])
+    
+    def _load_shards(self, bank, shards, tail=None):
+        tail = tail if tail is not None else {}
+        with bank._lock:
+            shards = [shard for shard in shards if shard not in self._loaded and shard not in self._loading]
+            if not shards:
+                return
+            # Replaying a shard's journal tail looks its customers up again,
+            # which must not start loading the same shard a second time.
+            # Lookups on other threads wait on the bank lock until the shard
+            # is complete.
+            self._loading.update(shards)
+            try:
+                # Files are read and parsed on a small pool; registration
+                # stays on this thread so the bank's lists are only touched
+                # here.
+                with ThreadPoolExecutor(max_workers=min(8, len(shards))) as pool:
+                    for shard, (snapshot_seq, customers) in zip(shards, pool.map(self._read_shard, shards)):
+                        bank._register_customers(customers)
+                        for record in tail.get(shard, []):
+                            if record["seq"] > snapshot_seq:
+                                self._apply_journal_record(bank, record)
+                                self._dirty.add(shard)
+                        self._loaded.add(shard)
+            finally:
+                self._loading.difference_update(shards)
+    
+    def _read_shard(self, shard):
+        header = {}
+        customers = []
+        if os.path.exists(self._path(shard)):
+            with open(self._path(shard), "r") as f:
+                customers = [self._customer_from_dict(customer_data)
+                             for customer_data in iter_customer_records(f, header)]
+        return header.get("journal_seq", 0), customers
+    
+    def all_resident(self):
+        return len(self._loaded) == self.shards
+    
+    def largest_eviction_group(self):
+        return max((len(customers) for customers in self._shard_customers.values()), default=0)
+    
+    def eviction_group(self, bank, customer):
+        # A shard is loaded and written as a whole, so it leaves as a whole.
+        # Nothing is evicted while a shard is loading: its journal replay
+        # looks customers up, and a half-loaded shard written back and
+        # dropped would lose the customers not yet registered.
+        if self._loading:
+            return None
+        shard = self.shard_of(customer.customer_id)
+        return [member for member in bank.customers if self.shard_of(member.customer_id) == shard]
+    
+    def evict(self, bank, customers):
+        # Called with the bank exclusive. The shard's snapshot is brought up
+        # to date before its customers go; its journal records stay until the
+        # next full save truncates them. A save still writing what it took
+        # before is waited for, so it cannot land on top of this snapshot.
+        for shard in {self.shard_of(customer.customer_id) for customer in customers}:
+            if shard in self._dirty:
+                with self._write_lock:
+                    self._write_shard(shard, [customer for customer in customers
+                                              if self.shard_of(customer.customer_id) == shard], self.journal.seq)
+                self._dirty.discard(shard)
+            self._loaded.discard(shard)
+    
+    def adopt(self, bank):
+        # Takes over a bank loaded from elsewhere, e.g. when splitting
+        # bank_data.json: every shard counts as loaded and changed.
+        for customer in bank.customers:
+            self._shard_customers.setdefault(self.shard_of(customer.customer_id), set()).add(customer.customer_id)
+            for account in customer.accounts:
+                self._account_shards[account.account_number] = self.shard_of(customer.customer_id)
+        self._loaded.update(range(self.shards))
+        self._dirty.update(range(self.shards))
+    
+    def save(self, bank):
+        with bank.exclusive():
+            shards = self._dirty
+            self._dirty = set()
+            seq = self.journal.seq
+            snapshots = {shard: [] for shard in shards}
+            for customer in bank.customers:
+                customers = snapshots.get(self.shard_of(customer.customer_id))
+                if customers is not None:
+                    customers.append(customer.copy())
+            # Taken before the bank is released, so an eviction cannot write
+            # one of these shards until they are on disk.
+            self._write_lock.acquire()
+        
+        try:
+            for shard, customers in snapshots.items():
+                self._write_shard(shard, customers, seq)
+        except Exception:
+            self._dirty.update(shards)
+            raise
+        finally:
+            self._write_lock.release()
+        self.journal.truncate(seq)
+    
+    def _write_shard(self, shard, customers, seq):
+        # Callers hold _write_lock.
+        if seq < self._written_seqs.get(shard, 0):
+            return
+        write_snapshot(self._path(shard), seq, (self._customer_to_dict(customer) for customer in customers))
+        write_atomic(self._path(shard, ".index.json"), json.dumps({
+            "journal_seq": seq,
+            "customers": [customer.customer_id for customer in customers],
+            "accounts": [account.account_number for customer in customers for account in customer.accounts]
+        }))
+        self._written_seqs[shard] = seq
+    
+    def save_customer(self, bank, customer, accounts=None):
+        # The rest of the shard has to be resident before it gets a new
+        # customer, or its next snapshot would leave the others out.
+        shard = self.shard_of(customer.customer_id)
+        self._load_shards(bank, [shard])
+        self._shard_customers.setdefault(shard, set()).add(customer.customer_id)
+        for account in (customer.accounts if accounts is None else accounts):
+            self._account_shards[account.account_number] = shard
+        self._dirty.add(shard)
+        super().save_customer(bank, customer, accounts)
+    
+    def record_transactions(self, bank, transactions):
+        self._dirty.update(self._account_shards[t.account_number] for t in transactions)
+        super().record_transactions(bank, transactions)
+    
+    def iter_transactions(self, account_numbers=None, start=None, end=None):
+        # Reads every shard from disk, loaded or not, then the journal tail;
+        # a tail record counts only if it is newer than its shard's snapshot.
+        # Nothing needs to have been loaded first: which shard an account
+        # belongs to comes from the index files and journaled customers.
+        wanted = self._row_filter(account_numbers, start, end)
+        snapshot_seqs = []
+        for shard in range(self.shards):
+            header = {}
+            yield from self._snapshot_rows(self._path(shard), header, account_numbers, wanted)
+            snapshot_seqs.append(header.get("journal_seq", 0))
+        account_shards = {account_number: shard for shard, index in self._read_indexes()
+                          for account_number in index["accounts"]}
+        
+        for record in TransactionJournal(self.journal.path).replay():
+            if "customer" in record:
+                shard = self.shard_of(record["customer"]["customer_id"])
+                for account_data in record["customer"]["accounts"]:
+                    account_shards.setdefault(account_data["account_number"], shard)
+                if record["seq"] <= snapshot_seqs[shard]:
+                    continue
+                records = [transaction_data for account_data in record["customer"]["accounts"]
+                           for transaction_data in account_data.get("transactions", [])]
+            else:
+                shard = account_shards.get(record["account_number"])
+                if shard is not None and record["seq"] <= snapshot_seqs[shard]:
+                    continue
+                records = [record]
+            for transaction_data in records:
+                row = self._journal_row(transaction_data)
+                if wanted(row[0], row[1]):
+                    yield row
+
+class JsonUserStorage:
+    # Users live in an append-only log of "<username JSON>\t<record JSON>"
+    # lines; a later line for the same username supersedes earlier ones. Only
+    # the usernames are parsed up front, into a username -> offset index, and
+    # a record is read from disk when that user is looked up. A legacy
+    # users.json is converted into the log once, on first use.
+    def __init__(self, path="users.json", log_path=None):
+        self.path = path
+        self.log_path = log_path if log_path is not None else os.path.splitext(path)[0] + ".log"
+        self._offsets = None
+        self._lock = threading.Lock()
+    
+    def _index(self):
+        if self._offsets is not None:
+            return self._offsets
+        if not os.path.exists(self.log_path) and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    legacy_users = json.load(f)
+                self._append(legacy_users.items())
+            except Exception as e:
+                print(f"Error loading users: {e}")
+        offsets = {}
+        if os.path.exists(self.log_path):
+            # A line cut short by a crash was never acknowledged; dropping it
+            # keeps the next append from being glued onto it.
+            trim_torn_tail(self.log_path)
+            with open(self.log_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    username, _, _ = line.partition(b"\t")
+                    try:
+                        offsets[json.loads(username)] = offset
+                    except ValueError:
+                        # Logs written before tails were trimmed can hold a
+                        # fragment glued to the next line.
+                        pass
+                    offset += len(line)
+        self._offsets = offsets
+        return offsets
+    
+    def _append(self, users):
+        lines = [f"{json.dumps(username)}\t{json.dumps(record)}\n".encode() for username, record in users]
+        with open(self.log_path, "ab") as f:
+            offset = f.tell()
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._offsets is not None:
+            for (username, _), line in zip(users, lines):
+                self._offsets[username] = offset
+                offset += len(line)
+    
+    def get_user(self, username):
+        with self._lock:
+            offset = self._index().get(username)
+            if offset is None:
+                return None
+            with open(self.log_path, "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline().partition(b"\t")[2])
+    
+    def add_user(self, username, record):
+        self.add_users([(username, record)])
+    
+    def add_users(self, users):
+        users = list(users)
+        with self._lock:
+            self._index()
+            self._append(users)
+    
+    def insert_users(self, users):
+        # Like add_users, but a username that already exists, or repeats
+        # within the batch, is skipped rather than replaced. The check and
+        # the append happen under one lock. Returns one bool per entry.
+        users = list(users)
+        results = []
+        new_users = []
+        seen = set()
+        with self._lock:
+            offsets = self._index()
+            for username, record in users:
+                ok = username not in offsets and username not in seen
+                if ok:
+                    seen.add(username)
+                    new_users.append((username, record))
+                results.append(ok)
+            if new_users:
+                self._append(new_users)
+        return results
+    
+    def iter_users(self):
+        with self._lock:
+            usernames = list(self._index())
+        for username in usernames:
+            yield username, self.get_user(username)
+
+class SQLiteStorage:
+    # One database holding both the bank model and the users table. Every
+    # deposit, withdrawal or transfer is a single small SQL transaction.
+    # With lazy=True nothing is read at startup; each customer is read in,
+    # with its accounts and history, the first time it is looked up.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS customers (
+            customer_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS accounts (
+            account_number TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            balance_cents INTEGER NOT NULL,
+            account_type TEXT NOT NULL,
+            opening_balance_cents INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS accounts_customer ON accounts (customer_id);
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            account_number TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            related_account TEXT
+        );
+        CREATE INDEX IF NOT EXISTS transactions_account_time ON transactions (account_number, timestamp);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            customer_id TEXT NOT NULL
+        );
+    """
+    INSERT_CUSTOMER = "INSERT OR REPLACE INTO customers VALUES (?, ?, ?, ?)"
+    INSERT_ACCOUNT = "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?, ?, ?)"
+    UPDATE_BALANCE = "UPDATE accounts SET balance_cents = ? WHERE account_number = ?"
+    INSERT_TRANSACTION = ("INSERT INTO transactions (account_number, amount_cents, transaction_type, "
+                          "timestamp, related_account) VALUES (?, ?, ?, ?, ?)")
+    INSERT_USER = "INSERT OR REPLACE INTO users VALUES (?, ?, ?)"
+    INSERT_NEW_USER = "INSERT INTO users VALUES (?, ?, ?)"
+    SELECT_USER = "SELECT password, customer_id FROM users WHERE username = ?"
+    
+    def __init__(self, path="bank.db", lazy=False):
+        self.path = path
+        self.lazy = lazy
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(self.SCHEMA)
+        # Databases from before the column opened every account at 0.
+        if "opening_balance_cents" not in {row[1] for row in self.conn.execute("PRAGMA table_info(accounts)")}:
+            self.conn.execute("ALTER TABLE accounts ADD COLUMN opening_balance_cents INTEGER NOT NULL DEFAULT 0")
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+    
+    def load(self, bank):
+        if self.lazy:
+            return
+        customers = {}
+        accounts = {}
+        with self._lock:
+            for customer_id, name, email, phone in self.conn.execute(
+                    "SELECT customer_id, name, email, phone FROM customers"):
+                customers[customer_id] = Customer(customer_id, name, email, phone)
+            openings = {}
+            for account_number, customer_id, balance_cents, account_type, opening_balance_cents in self.conn.execute(
+                    "SELECT account_number, customer_id, balance_cents, account_type, opening_balance_cents "
+                    "FROM accounts"):
+                customer = customers[customer_id]
+                account = Account(account_number, customer, balance_cents, account_type)
+                customer.add_account(account)
+                accounts[account_number] = account
+                openings[account_number] = opening_balance_cents
+            for account_number, amount_cents, transaction_type, timestamp, related_account in self.conn.execute(
+                    "SELECT account_number, amount_cents, transaction_type, timestamp, related_account "
+                    "FROM transactions ORDER BY id"):
+                accounts[account_number].transactions.add(
+                    amount_cents, transaction_type, EPOCH + timestamp * MICROSECOND, related_account)
+        for account in accounts.values():
+            account.restore_opening_balance(openings[account.account_number])
+        bank._register_customers(customers.values())
+    
+    def save(self, bank):
+        with bank.exclusive(), self._lock, self.conn:
+            if self.lazy:
+                # Customers that are not resident are already on disk as
+                # committed; only the resident ones are rewritten.
+                for customer in bank.customers:
+                    self.conn.execute("DELETE FROM transactions WHERE account_number IN "
+                                      "(SELECT account_number FROM accounts WHERE customer_id = ?)",
+                                      (customer.customer_id,))
+                    self.conn.execute("DELETE FROM accounts WHERE customer_id = ?", (customer.customer_id,))
+            else:
+                self.conn.execute("DELETE FROM transactions")
+                self.conn.execute("DELETE FROM accounts")
+                self.conn.execute("DELETE FROM customers")
+            for customer in bank.customers:
+                self._insert_customer(customer)
+                for account in customer.accounts:
+                    store = account.transactions
+                    self.conn.executemany(self.INSERT_TRANSACTION, (
+                        (account.account_number, store.amounts[i], TRANSACTION_TYPES[store.types[i]],
+                         store.timestamps[i], ACCOUNT_IDS.lookup(store.related[i]))
+                        for i in range(len(store))
+                    ))
+    
+    def save_customer(self, bank, customer, accounts=None):
+        with self._lock, self.conn:
+            self._insert_customer(customer, accounts)
+    
+    def flush(self):
+        # Every write is committed before it returns; nothing is deferred.
+        pass
+    
+    def load_missing(self, bank, customer_id=None, account_number=None):
+        if not self.lazy:
+            return
+        with self._lock:
+            if customer_id is None:
+                row = self.conn.execute("SELECT customer_id FROM accounts WHERE account_number = ?",
+                                        (account_number,)).fetchone()
+                if row is None:
+                    return
+                customer_id = row[0]
+            row = self.conn.execute("SELECT name, email, phone FROM customers WHERE customer_id = ?",
+                                    (customer_id,)).fetchone()
+            if row is None:
+                return
+            customer = Customer(customer_id, *row)
+            for account_number, balance_cents, account_type, opening_balance_cents in self.conn.execute(
+                    "SELECT account_number, balance_cents, account_type, opening_balance_cents FROM accounts "
+                    "WHERE customer_id = ?", (customer_id,)).fetchall():
+                account = Account(account_number, customer, balance_cents, account_type)
+                for amount_cents, transaction_type, timestamp, related_account in self.conn.execute(
+                        "SELECT amount_cents, transaction_type, timestamp, related_account FROM transactions "
+                        "WHERE account_number = ? ORDER BY id", (account_number,)):
+                    account.transactions.add(
+                        amount_cents, transaction_type, EPOCH + timestamp * MICROSECOND, related_account)
+                account.restore_opening_balance(opening_balance_cents)
+                customer.add_account(account)
+        with bank._lock:
+            # Another thread may have read the same customer in meanwhile.
+            if bank._customers_by_id.get(customer_id) is None:
+                bank._register_customers([customer])
+    
+    def all_resident(self):
+        return not self.lazy
+    
+    def largest_eviction_group(self):
+        return 1 if self.lazy else None
+    
+    def eviction_group(self, bank, customer):
+        # Every change is committed as it happens, so a lazy store can drop
+        # any customer and read it back later.
+        return [customer] if self.lazy else None
+    
+    def evict(self, bank, customers):
+        pass
+    
+    def _insert_customer(self, customer, accounts=None):
+        self.conn.execute(self.INSERT_CUSTOMER,
+                          (customer.customer_id, customer.name, customer.email, customer.phone))
+        self.conn.executemany(self.INSERT_ACCOUNT, (
+            (account.account_number, customer.customer_id, account.balance, account.account_type,
+             account.transactions.opening_balance)
+            for account in (customer.accounts if accounts is None else accounts)
+        ))
+    
+    def record_transactions(self, bank, transactions):
+        touched = {t.account_number: bank.find_account(t.account_number) for t in transactions}
+        with self._lock, self.conn:
+            self.conn.executemany(self.INSERT_TRANSACTION, (
+                (t.account_number, t.amount, t.transaction_type,
+                 (t.timestamp - EPOCH) // MICROSECOND, t.related_account)
+                for t in transactions
+            ))
+            self.conn.executemany(self.UPDATE_BALANCE, (
+                (account.balance, account_number) for account_number, account in touched.items()
+            ))
+    
+    def iter_transactions(self, account_numbers=None, start=None, end=None):
+        # Same rows as JsonStorage.iter_transactions, fetched in batches from
+        # a dedicated read connection so the export never holds the lock.
+        conditions = []
+        params = []
+        if account_numbers is not None:
+            account_numbers = list(account_numbers)
+            conditions.append(f"account_number IN ({', '.join('?' * len(account_numbers))})")
+            params.extend(account_numbers)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append((start - EPOCH) // MICROSECOND)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append((end - EPOCH) // MICROSECOND)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        reader = sqlite3.connect(self.path)
+        try:
+            cursor = reader.execute(
+                "SELECT account_number, timestamp, transaction_type, amount_cents, related_account "
+                f"FROM transactions {where} ORDER BY account_number, id", params)
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            reader.close()
+    
+    def get_user(self, username):
+        with self._lock:
+            row = self.conn.execute(self.SELECT_USER, (username,)).fetchone()
+        if row is None:
+            return None
+        return {"password": row[0], "customer_id": row[1]}
+    
+    def add_user(self, username, record):
+        self.add_users([(username, record)])
+    
+    def add_users(self, users):
+        with self._lock, self.conn:
+            self.conn.executemany(self.INSERT_USER, (
+                (username, record["password"], record["customer_id"]) for username, record in users
+            ))
+    
+    def insert_users(self, users):
+        # The primary key makes the insert itself the existence check.
+        results = []
+        with self._lock, self.conn:
+            for username, record in users:
+                try:
+                    self.conn.execute(self.INSERT_NEW_USER, (username, record["password"], record["customer_id"]))
+                    results.append(True)
+                except sqlite3.IntegrityError:
+                    results.append(False)
+        return results
+
+class TransactionEngine:
+    # Lock striping over account numbers. An operation holds only the stripes
+    # of the accounts it touches, always taken in ascending stripe order, so
+    # transfers A->B and B->A running at once cannot deadlock.
+    def __init__(self, bank, stripes=64):
+        self.bank = bank
+        self.locks = [threading.Lock() for _ in range(stripes)]
+    
+    @contextmanager
+    def _holding(self, indices):
+        for index in indices:
+            self.locks[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(indices):
+                self.locks[index].release()
+    
+    def locked(self, *account_numbers):
+        return self._holding(sorted({hash(number) % len(self.locks) for number in account_numbers}))
+    
+    def locked_all(self):
+        return self._holding(range(len(self.locks)))
+    
+    @contextmanager
+    def holding(self, *accounts):
+        # Locks the accounts' stripes and yields them. The bank only evicts
+        # with every stripe held, so the accounts stay resident while locked;
+        # an object the cache already dropped is swapped for the resident
+        # copy before anything is posted to it. Copies stay pinned until the
+        # posting is done, so threads evicting each other's accounts still
+        # make progress.
+        pinned = []
+        try:
+            while True:
+                with self.locked(*(account.account_number for account in accounts)):
+                    if all(self.bank.is_resident(account) for account in accounts):
+                        yield accounts
+                        return
+                accounts = tuple(self.bank.resident_copy(account) for account in accounts)
+                for account in accounts:
+                    self.bank.pin(account.owner)
+                    pinned.append(account.owner)
+        finally:
+            for customer in pinned:
+                self.bank.unpin(customer)
+    
+    @contextmanager
+    def reverting(self, *accounts):
+        # Accounts are changed in memory before the change is persisted. If
+        # persisting fails, balances and history go back to how they were,
+        # so the next snapshot cannot write out a posting nobody recorded.
+        # Callers hold the accounts' stripes.
+        saved = [(account, account.balance, len(account.transactions)) for account in accounts]
+        try:
+            yield
+        except BaseException:
+            for account, balance, length in reversed(saved):
+                account.balance = balance
+                account.transactions.truncate(length)
+            raise
+    
+    def deposit(self, account, amount):
+        with self.holding(account) as (account,), self.reverting(account):
+            transaction = account.deposit(amount)
+            self.bank.record_transactions(transaction)
+        return transaction
+    
+    def withdraw(self, account, amount):
+        with self.holding(account) as (account,), self.reverting(account):
+            transaction = account.withdraw(amount)
+            self.bank.record_transactions(transaction)
+        return transaction
+    
+    def transfer(self, account, amount, recipient_account):
+        with self.holding(account, recipient_account) as (account, recipient_account), \
+                self.reverting(account, recipient_account):
+            transactions = account.transfer(amount, recipient_account)
+            self.bank.record_transactions(*transactions)
+        return transactions
+
+class Bank:
+    def __init__(self, storage=None, lock_stripes=64, cache_size=None):
+        # customers and accounts are live views of the indexes, so dropping
+        # a customer costs its own size rather than a rebuild of both.
+        self._customers_by_id = {}
+        self._accounts_by_number = {}
+        self.customers = self._customers_by_id.values()
+        self.accounts = self._accounts_by_number.values()
+        self.storage = storage if storage is not None else JsonStorage()
+        self._lock = threading.RLock()
+        self.engine = TransactionEngine(self, lock_stripes)
+        # With a cache_size, at most that many customers stay resident
+        # (least recently used first in _recent). Colder ones are written
+        # back and dropped if the storage can read them in again, which it
+        # does on their next lookup. Pinned customers are never dropped.
+        self.cache_size = cache_size
+        self._recent = OrderedDict()
+        self._pinned = Counter()
+        # Guards _recent and the counters, which lookups update without any
+        # other lock. Nothing else is acquired while it is held.
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._warned_cache_size = False
+        self.load_data()
+        if cache_size is not None:
+            # Groups are evicted whole, so a budget smaller than one would
+            # evict and reload it on nearly every lookup.
+            largest = self.storage.largest_eviction_group()
+            if largest is None:
+                raise ValueError("cache_size needs a storage that can evict, e.g. ShardedStorage "
+                                 "or a lazy SQLiteStorage")
+            if cache_size < largest:
+                raise ValueError(f"cache_size {cache_size} is smaller than the largest eviction group "
+                                 f"({largest} customers); raise it to at least the shard size")
+    
+    @contextmanager
+    def exclusive(self):
+        # Blocks structural changes and every account operation, e.g. while a
+        # consistent snapshot is taken.
+        with self._lock, self.engine.locked_all():
+            yield
+    
+    def add_customer(self, customer):
+        # The stripes keep postings to the new accounts from reaching storage
+        # ahead of the accounts themselves.
+        with self._lock, self.engine.locked(*(account.account_number for account in customer.accounts)):
+            self._register_customers([customer])
+            self.storage.save_customer(self, customer)
+        self._trim_cache(customer)
+    
+    def _register_customers(self, customers):
+        for customer in customers:
+            self._customers_by_id[customer.customer_id] = customer
+            if self.cache_size is not None:
+                with self._cache_lock:
+                    self._recent[customer.customer_id] = customer
+            for account in customer.accounts:
+                self._index_account(account)
+    
+    def _index_account(self, account):
+        self._accounts_by_number[account.account_number] = account
+    
+    def _unregister_customers(self, customers):
+        for customer in customers:
+            self._customers_by_id.pop(customer.customer_id, None)
+            with self._cache_lock:
+                self._recent.pop(customer.customer_id, None)
+            for account in customer.accounts:
+                self._accounts_by_number.pop(account.account_number, None)
+    
+    def add_account(self, customer, account):
+        with self._lock, self.engine.locked(account.account_number):
+            customer.add_account(account)
+            self._index_account(account)
+            self.storage.save_customer(self, customer, [account])
+    
+    def find_customer(self, customer_id, load=True):
+        # With load=False only resident customers are found; nothing is read
+        # from storage, so it is safe on threads that must not block.
+        customer = self._customers_by_id.get(customer_id)
+        if customer is not None:
+            self._touch(customer)
+            return customer
+        if not load:
+            return None
+        self._count_miss()
+        self.storage.load_missing(self, customer_id=customer_id)
+        customer = self._customers_by_id.get(customer_id)
+        self._trim_cache(customer)
+        return customer
+    
+    def find_account(self, account_number, load=True):
+        account = self._accounts_by_number.get(account_number)
+        if account is not None:
+            self._touch(account.owner)
+            return account
+        if not load:
+            return None
+        self._count_miss()
+        self.storage.load_missing(self, account_number=account_number)
+        account = self._accounts_by_number.get(account_number)
+        self._trim_cache(None if account is None else account.owner)
+        return account
+    
+    def is_resident(self, account):
+        return self._accounts_by_number.get(account.account_number) is account
+    
+    def resident_copy(self, account):
+        current = self.find_account(account.account_number)
+        if current is None:
+            raise LookupError(f"Account {account.account_number} no longer exists")
+        return current
+    
+    def pin(self, customer):
+        # Keeps a customer resident while something holds on to its objects,
+        # e.g. the logged-in customer of the desktop app.
+        with self._lock:
+            self._pinned[customer.customer_id] += 1
+    
+    def unpin(self, customer):
+        with self._lock:
+            self._pinned[customer.customer_id] -= 1
+            if self._pinned[customer.customer_id] <= 0:
+                del self._pinned[customer.customer_id]
+        self._trim_cache()
+    
+    def cache_info(self):
+        with self._cache_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident": len(self._customers_by_id),
+                "cache_size": self.cache_size
+            }
+    
+    def _touch(self, customer):
+        with self._cache_lock:
+            self.hits += 1
+            if self.cache_size is not None and customer is not None:
+                try:
+                    self._recent.move_to_end(customer.customer_id)
+                except KeyError:
+                    pass
+    
+    def _count_miss(self):
+        with self._cache_lock:
+            self.misses += 1
+    
+    def _trim_cache(self, keep=None):
+        if self.cache_size is None or len(self._recent) <= self.cache_size:
+            return
+        with self.exclusive():
+            # Each resident customer is considered at most once per trim, so
+            # a cache full of pinned customers cannot loop forever.
+            for _ in range(len(self._recent)):
+                with self._cache_lock:
+                    if len(self._recent) <= self.cache_size:
+                        break
+                    customer_id, customer = next(iter(self._recent.items()))
+                group = self.storage.eviction_group(self, customer)
+                if group is None:
+                    break
+                if len(group) > self.cache_size and not self._warned_cache_size:
+                    # Storage that evicts whole groups (shards) reloads one on
+                    # nearly every lookup outside it when a group alone fills
+                    # the cache.
+                    print(f"Warning: cache_size {self.cache_size} is smaller than an eviction group "
+                          f"of {len(group)} customers; raise it to at least the shard size")
+                    self._warned_cache_size = True
+                if keep in group or any(member.customer_id in self._pinned for member in group):
+                    with self._cache_lock:
+                        self._recent.move_to_end(customer_id)
+                    continue
+                self.storage.evict(self, group)
+                self._unregister_customers(group)
+                with self._cache_lock:
+                    self.evictions += len(group)
+    
+    def query_transactions(self, account_number=None, **filters):
+        if account_number is not None:
+            account = self.find_account(account_number)
+            return [] if account is None else account.query_transactions(**filters)
+        if not self.storage.all_resident():
+            # Some customers are only on disk, so resident accounts would give
+            # a partial answer; the storage's own rows are complete.
+            return self._query_storage(**filters)
+        # Registration changes the index under the bank lock; iterating the
+        # live view while that happens would fail.
+        with self._lock:
+            accounts = list(self.accounts)
+        results = []
+        for account in accounts:
+            results.extend(account.query_transactions(**filters))
+        return results
+    
+    def _query_storage(self, start=None, end=None, transaction_type=None, related_account=None,
+                       min_amount=None, max_amount=None):
+        return [
+            Transaction(amount, kind, account_number, related, EPOCH + micros * MICROSECOND)
+            for account_number, micros, kind, amount, related in self.storage.iter_transactions(None, start, end)
+            if (transaction_type is None or kind == transaction_type)
+            and (related_account is None or related == related_account)
+            and (min_amount is None or amount >= min_amount)
+            and (max_amount is None or amount <= max_amount)
+        ]
+    
+    def deposit(self, account, amount):
+        return self.engine.deposit(account, amount)
+    
+    def withdraw(self, account, amount):
+        return self.engine.withdraw(account, amount)
+    
+    def transfer(self, account, amount, recipient_account):
+        return self.engine.transfer(account, amount, recipient_account)
+    
+    def post_batch(self, postings):
+        # Postings are dicts with "action" ("deposit", "withdraw" or
+        # "transfer"), "account_number", "amount" in cents and, for transfers,
+        # "recipient_account". Either every posting is applied and persisted
+        # with a single storage write, or none is. Each result's "balance" is
+        # the account's balance right after that posting.
+        postings = list(postings)
+        account_numbers = set()
+        for posting in postings:
+            if isinstance(posting, dict):
+                # Anything that is not a string is reported per posting by
+                # _validate_batch rather than breaking the set.
+                account_numbers.update(number for number in (posting.get("account_number"),
+                                                              posting.get("recipient_account"))
+                                       if isinstance(number, str))
+        
+        # Any storage loading the lookups need happens before the stripes are
+        # held; loading takes the bank lock, which ranks above them. Owners
+        # found are pinned until the batch is done, so a batch touching more
+        # customers than the cache holds cannot keep evicting its own accounts.
+        # If the cache dropped one before its pin, the lookups run again.
+        pinned = {}
+        try:
+            while True:
+                known = []
+                for number in account_numbers:
+                    account = self.find_account(number)
+                    if account is None:
+                        continue
+                    known.append(number)
+                    if account.owner.customer_id not in pinned:
+                        self.pin(account.owner)
+                        pinned[account.owner.customer_id] = account.owner
+                with self.engine.locked(*account_numbers):
+                    if all(number in self._accounts_by_number for number in known):
+                        return self._apply_batch(postings)
+        finally:
+            for customer in pinned.values():
+                self.unpin(customer)
+    
+    def _apply_batch(self, postings):
+        results = self._validate_batch(postings)
+        if not all(result["ok"] for result in results):
+            for result in results:
+                del result["balance"]
+            return {"applied": False, "results": results}
+        
+        accounts = set()
+        for posting in postings:
+            accounts.add(self._accounts_by_number[posting["account_number"]])
+            if posting["action"] == "transfer":
+                accounts.add(self._accounts_by_number[posting["recipient_account"]])
+        
+        transactions = []
+        with self.engine.reverting(*accounts):
+            for posting in postings:
+                account = self._accounts_by_number[posting["account_number"]]
+                if posting["action"] == "deposit":
+                    transactions.append(account.deposit(posting["amount"]))
+                elif posting["action"] == "withdraw":
+                    transactions.append(account.withdraw(posting["amount"]))
+                else:
+                    recipient_account = self._accounts_by_number[posting["recipient_account"]]
+                    transactions.extend(account.transfer(posting["amount"], recipient_account))
+            self.record_transactions(*transactions)
+        return {"applied": True, "results": results}
+    
+    def _validate_batch(self, postings):
+        # Replays the batch against projected balances so an overdraft caused
+        # by an earlier posting in the same batch is caught before anything
+        # is applied.
+        balances = {}
+        results = []
+        for index, posting in enumerate(postings):
+            error = None
+            balance = None
+            if not isinstance(posting, dict):
+                results.append({"index": index, "ok": False, "error": "Posting must be an object",
+                                "balance": None})
+                continue
+            action = posting.get("action")
+            amount = posting.get("amount")
+            account = self._resident_account(posting.get("account_number"))
+            recipient_account = None
+            if action == "transfer":
+                recipient_account = self._resident_account(posting.get("recipient_account"))
+            
+            if action not in ("deposit", "withdraw", "transfer"):
+                error = f"Unknown action {action!r}"
+            elif account is None:
+                error = "Account not found"
+            elif not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+                error = "Amount must be a positive number of cents"
+            elif amount > MAX_AMOUNT_CENTS:
+                error = f"Amount must be at most {format_cents(MAX_AMOUNT_CENTS)}"
+            elif action == "transfer" and recipient_account is None:
+                error = "Recipient account not found"
+            elif action == "transfer" and recipient_account is account:
+                error = "Cannot transfer to the same account"
+            else:
+                balance = balances.get(account.account_number, account.balance)
+                if action == "deposit":
+                    balance += amount
+                elif balance < amount:
+                    error = "Insufficient funds"
+                    balance = None
+                else:
+                    balance -= amount
+                    if recipient_account is not None:
+                        number = recipient_account.account_number
+                        balances[number] = balances.get(number, recipient_account.balance) + amount
+                if error is None:
+                    balances[account.account_number] = balance
+            
+            results.append({"index": index, "ok": error is None, "error": error, "balance": balance})
+        return results
+    
+    def _resident_account(self, account_number):
+        # Only strings can be account numbers; anything else, e.g. a list
+        # from a JSON body, is simply not found.
+        return self._accounts_by_number.get(account_number) if isinstance(account_number, str) else None
+    
+    def record_transactions(self, *transactions):
+        # Callers must have applied the transactions while holding the
+        # engine stripes of every account involved, so a snapshot taken under
+        # exclusive() never sees a balance without its record.
+        self.storage.record_transactions(self, transactions)
+    
+    def save_data(self):
+        self.storage.save(self)
+    
+    def close(self):
+        # Flushes and releases the storage; the bank is not used afterwards.
+        self.storage.close()
+    
+    def flush(self):
+        # Durability barrier for anything storage is still writing behind.
+        self.storage.flush()
+    
+    def load_data(self):
+        self.storage.load(self)
+        self._trim_cache()
+
+class Sha256Hasher:
+    # The original unsalted format, kept only so existing users can log in
+    # once and be upgraded.
+    name = "sha256"
+    
+    def hash(self, password):
+        return hashlib.sha256(password.encode()).hexdigest()
+    
+    def verify(self, password, stored):
+        return hmac.compare_digest(self.hash(password), stored)
+    
+    def needs_upgrade(self, stored):
+        return "$" in stored
+
+class Pbkdf2Hasher:
+    name = "pbkdf2_sha256"
+    
+    def __init__(self, iterations=600000):
+        self.iterations = iterations
+    
+    def _derive(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.iterations)
+        return f"{self.name}${self.iterations}${salt.hex()}${digest.hex()}"
+    
+    def verify(self, password, stored):
+        _, iterations, salt, digest = stored.split("$")
+        return hmac.compare_digest(self._derive(password, bytes.fromhex(salt), int(iterations)).hex(), digest)
+    
+    def needs_upgrade(self, stored):
+        return not stored.startswith(self.name + "$") or stored.split("$")[1] != str(self.iterations)
+
+class ScryptHasher:
+    name = "scrypt"
+    
+    def __init__(self, n=2 ** 14, r=8, p=1):
+        self.n = n
+        self.r = r
+        self.p = p
+    
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32)
+    
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.name}${self.n}${self.r}${self.p}${salt.hex()}${digest.hex()}"
+    
+    def verify(self, password, stored):
+        _, n, r, p, salt, digest = stored.split("$")
+        derived = self._derive(password, bytes.fromhex(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derived.hex(), digest)
+    
+    def needs_upgrade(self, stored):
+        return (not stored.startswith(self.name + "$")
+                or stored.split("$")[1:4] != [str(self.n), str(self.r), str(self.p)])
+
+PASSWORD_HASHERS = {hasher.name: hasher for hasher in (Sha256Hasher(), Pbkdf2Hasher(), ScryptHasher())}
 
 class UserManager:
-    def __init__(self):
-        self.users = {}
-        self.load_users()
+    def __init__(self, storage=None, hasher=None, workers=4, cache_size=1024):
+        self.storage = storage if storage is not None else JsonUserStorage()
+        self.hasher = hasher if hasher is not None else Pbkdf2Hasher()
+        # hashlib releases the GIL while deriving keys, so a thread pool is
+        # enough to keep slow hashes off the UI and event-loop threads.
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # username -> (stored hash, HMAC of the password under a per-process
+        # key). Lets repeat logins skip the KDF without keeping plaintext.
+        self.cache_size = cache_size
+        self._verified = OrderedDict()
+        self._cache_key = os.urandom(32)
+        self._cache_lock = threading.Lock()
     
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.hasher.hash(password)
+    
+    def _hasher_for(self, stored):
+        name = stored.split("$", 1)[0] if "$" in stored else Sha256Hasher.name
+        return PASSWORD_HASHERS[name]
     
     def register_user(self, username, password, customer_id):
-        if username in self.users:
+        # The early check only saves hashing for a taken name; registrations
+        # running on other workers are caught by the storage's insert.
+        if self.storage.get_user(username) is not None:
             return False
-        self.users[username] = {
+        return self.storage.insert_users([(username, {
             "password": self.hash_password(password),
             "customer_id": customer_id
-        }
-        self.save_users()
-        return True
+        })])[0]
+    
+    def register_users(self, users):
+        # Bulk onboarding: hashes on the worker pool and writes every new
+        # user with a single storage append. Returns one bool per entry,
+        # False for usernames that already exist or repeat within the batch.
+        users = list(users)
+        accepted = set()
+        results = []
+        for username, _, _ in users:
+            ok = username not in accepted and self.storage.get_user(username) is None
+            if ok:
+                accepted.add(username)
+            results.append(ok)
+        
+        new_users = [user for user, ok in zip(users, results) if ok]
+        hashes = self.executor.map(self.hash_password, [password for _, password, _ in new_users])
+        inserted = iter(self.storage.insert_users(
+            (username, {"password": password_hash, "customer_id": customer_id})
+            for (username, _, customer_id), password_hash in zip(new_users, hashes)
+        ))
+        return [ok and next(inserted) for ok in results]
+    
+    def register_user_async(self, username, password, customer_id):
+        return self.executor.submit(self.register_user, username, password, customer_id)
     
     def authenticate(self, username, password):
-        if username not in self.users:
+        user = self.storage.get_user(username)
+        if user is None:
             return None
-        if self.users[username]["password"] == self.hash_password(password):
-            return self.users[username]["customer_id"]
-        return None
+        stored = user["password"]
+        
+        proof = hmac.new(self._cache_key, password.encode(), hashlib.sha256).digest()
+        with self._cache_lock:
+            cached = self._verified.get(username)
+            if cached is not None and cached[0] == stored and hmac.compare_digest(cached[1], proof):
+                self._verified.move_to_end(username)
+                if METRICS.enabled:
+                    METRICS.count("users.credential_cache_hits")
+                return user["customer_id"]
+        
+        if METRICS.enabled:
+            METRICS.count("users.credential_cache_misses")
+        hasher = self._hasher_for(stored)
+        if not hasher.verify(password, stored):
+            return None
+        
+        # Transparently move old or differently tuned hashes to the current
+        # hasher now that the plaintext is at hand.
+        if self.hasher.needs_upgrade(stored):
+            if METRICS.enabled:
+                METRICS.count("users.hash_upgrades")
+            stored = self.hash_password(password)
+            self.storage.add_user(username, {"password": stored, "customer_id": user["customer_id"]})
+        
+        with self._cache_lock:
+            self._verified[username] = (stored, proof)
+            self._verified.move_to_end(username)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return user["customer_id"]
     
-    def save_users(self):
-        with open("users.json", "w") as f:
-            json.dump(self.users, f)
+    def authenticate_async(self, username, password):
+        return self.executor.submit(self.authenticate, username, password)
+
+def migrate_to_sqlite(db_path, data_file="bank_data.json", journal_file="bank_journal.log",
+                      users_file="users.json"):
+    bank = Bank(JsonStorage(data_file, journal_file))
+    users = list(JsonUserStorage(users_file).iter_users())
     
-    def load_users(self):
-        if not os.path.exists("users.json"):
-            return
+    target = SQLiteStorage(db_path)
+    target.save(bank)
+    target.add_users(users)
+    target.close()
+    
+    return {
+        "customers": len(bank.customers),
+        "accounts": len(bank.accounts),
+        "transactions": sum(len(account.transactions) for account in bank.accounts),
+        "users": len(users)
+    }
+
+def migrate_to_shards(directory, shards=16, data_file="bank_data.json", journal_file="bank_journal.log"):
+    bank = Bank(JsonStorage(data_file, journal_file))
+    target = ShardedStorage(directory, shards)
+    target.adopt(bank)
+    target.save(bank)
+    return {"customers": len(bank.customers), "accounts": len(bank.accounts), "shards": target.shards}
+
+def open_storage(db_path=None, shard_dir=None, preload=False, lazy=False):
+    if db_path:
+        storage = SQLiteStorage(db_path, lazy)
+        return storage, storage
+    if shard_dir:
+        return ShardedStorage(shard_dir, preload=preload), JsonUserStorage()
+    return JsonStorage(), JsonUserStorage()
+
+# Reconciliation
+def reconcile_customers(text):
+    # Worker side of reconcile_file: parses a run of customers, checks each
+    # account's balance against its history and tallies transfer legs keyed
+    # (source, target, amount) so the parent can hash-join outs against ins
+    # across all shards.
+    report = {"accounts": 0, "transactions": 0, "balance_mismatches": [], "invalid_transactions": [],
+              "transfers_out": Counter(), "transfers_in": Counter()}
+    for customer_data in json.loads("[" + text + "]"):
+        for account_data in customer_data.get("accounts", []):
+            account_number = account_data["account_number"]
+            expected = account_data.get("opening_balance_cents", 0)
+            for transaction_data in account_data.get("transactions", []):
+                amount = cents_field(transaction_data, "amount")
+                transaction_type = transaction_data["transaction_type"]
+                related_account = transaction_data.get("related_account")
+                if transaction_type in ("Deposit", "Transfer In"):
+                    expected += amount
+                else:
+                    expected -= amount
+                if transaction_type == "Transfer Out":
+                    report["transfers_out"][(account_number, related_account, amount)] += 1
+                elif transaction_type == "Transfer In":
+                    report["transfers_in"][(related_account, account_number, amount)] += 1
+                elif transaction_type not in TRANSACTION_TYPE_CODES:
+                    report["invalid_transactions"].append(
+                        {"account_number": account_number, "transaction_type": transaction_type})
+                if transaction_data.get("account_number", account_number) != account_number:
+                    report["invalid_transactions"].append(
+                        {"account_number": account_number, "recorded_account": transaction_data["account_number"]})
+            report["transactions"] += len(account_data.get("transactions", []))
+            report["accounts"] += 1
+            balance = cents_field(account_data, "balance")
+            if balance != expected:
+                report["balance_mismatches"].append(
+                    {"account_number": account_number, "balance_cents": balance, "expected_cents": expected})
+    return report
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def reconcile_file(data_file="bank_data.json", journal_file="bank_journal.log", processes=None,
+                   chunk_chars=1 << 22, limit=1000):
+    # The parent only cuts the file into runs of whole customers; parsing
+    # and checking happen in the pool. At most two runs per worker are in
+    # flight, so memory stays bounded however large the file is.
+    started = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    totals = {"accounts": 0, "transactions": 0}
+    mismatches = []
+    invalid = []
+    transfers_out = Counter()
+    transfers_in = Counter()
+    
+    def merge(report):
+        totals["accounts"] += report["accounts"]
+        totals["transactions"] += report["transactions"]
+        mismatches.extend(report["balance_mismatches"])
+        invalid.extend(report["invalid_transactions"])
+        transfers_out.update(report["transfers_out"])
+        transfers_in.update(report["transfers_in"])
+    
+    header = {}
+    with multiprocessing.Pool(processes) as pool, open(data_file, "r") as f:
+        pending = deque()
+        for text in iter_customer_records(f, header, chunk_chars):
+            pending.append(pool.apply_async(reconcile_customers, (text,)))
+            if len(pending) >= processes * 2:
+                merge(pending.popleft().get())
+        while pending:
+            merge(pending.popleft().get())
+    
+    # Journal records newer than the snapshot move balance and history
+    # together, so they only matter for transfer pairing.
+    journal_transactions = 0
+    for record in iter_journal_transactions(journal_file, header.get("journal_seq", 0)):
+        journal_transactions += 1
+        key = (record["account_number"], record.get("related_account"), cents_field(record, "amount"))
+        if record["transaction_type"] == "Transfer Out":
+            transfers_out[key] += 1
+        elif record["transaction_type"] == "Transfer In":
+            transfers_in[(key[1], key[0], key[2])] += 1
+    
+    # Hash join: every (source, target, amount) out-leg needs an in-leg.
+    unmatched_out = transfers_out - transfers_in
+    unmatched_in = transfers_in - transfers_out
+    
+    def legs(counter):
+        return [{"from": source, "to": target, "amount_cents": amount, "count": count}
+                for (source, target, amount), count in list(counter.items())[:limit]]
+    
+    return {
+        "data_file": data_file,
+        "ok": not (mismatches or invalid or unmatched_out or unmatched_in),
+        "accounts": totals["accounts"],
+        "transactions": totals["transactions"],
+        "journal_transactions": journal_transactions,
+        "transfer_legs": sum(transfers_out.values()) + sum(transfers_in.values()),
+        "balance_mismatch_count": len(mismatches),
+        "balance_mismatches": mismatches[:limit],
+        "invalid_transaction_count": len(invalid),
+        "invalid_transactions": invalid[:limit],
+        "unmatched_transfers_out_count": sum(unmatched_out.values()),
+        "unmatched_transfers_out": legs(unmatched_out),
+        "unmatched_transfers_in_count": sum(unmatched_in.values()),
+        "unmatched_transfers_in": legs(unmatched_in),
+        "processes": processes,
+        "seconds": time.perf_counter() - started
+    }
+
+# Export
+LEDGER_COLUMNS = ("account_number", "timestamp", "transaction_type", "amount_cents", "related_account")
+COLUMNAR_MAGIC = b"BANKCOL1"
+
+def write_csv_chunk(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(LEDGER_COLUMNS)
+        for account_number, micros, transaction_type, amount, related_account in rows:
+            writer.writerow((account_number, (EPOCH + micros * MICROSECOND).isoformat(),
+                             transaction_type, amount, related_account or ""))
+    return path
+
+def write_columnar_chunk(path, rows):
+    # Layout: magic, a little-endian uint32 header length, a JSON header
+    # naming each column's type and byte range plus the string dictionary,
+    # then the raw column arrays. Account numbers are dictionary codes.
+    dictionary = AccountIds()
+    columns = {
+        "account": array("i"),
+        "timestamp": array("q"),
+        "type": array("b"),
+        "amount_cents": array("q"),
+        "related": array("i"),
+    }
+    for account_number, micros, transaction_type, amount, related_account in rows:
+        columns["account"].append(dictionary.intern(account_number))
+        columns["timestamp"].append(micros)
+        columns["type"].append(TRANSACTION_TYPE_CODES[transaction_type])
+        columns["amount_cents"].append(amount)
+        columns["related"].append(dictionary.intern(related_account))
+    
+    layout = []
+    offset = 0
+    for name, values in columns.items():
+        if sys.byteorder != "little":
+            values.byteswap()
+        size = len(values) * values.itemsize
+        layout.append({"name": name, "typecode": values.typecode, "offset": offset, "length": size})
+        offset += size
+    header = json.dumps({
+        "rows": len(rows),
+        "columns": layout,
+        "dictionary": dictionary.numbers,
+        "transaction_types": TRANSACTION_TYPES,
+    }).encode()
+    
+    with open(path, "wb") as f:
+        f.write(COLUMNAR_MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        for values in columns.values():
+            values.tofile(f)
+    return path
+
+def read_columnar_chunk(path):
+    with open(path, "rb") as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar ledger chunk")
+        header = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+        columns = {}
+        for column in header["columns"]:
+            values = array(column["typecode"])
+            values.frombytes(f.read(column["length"]))
+            if sys.byteorder != "little":
+                values.byteswap()
+            columns[column["name"]] = values
+    dictionary = header["dictionary"]
+    types = header["transaction_types"]
+    for i in range(header["rows"]):
+        related = columns["related"][i]
+        yield (dictionary[columns["account"][i]], columns["timestamp"][i], types[columns["type"][i]],
+               columns["amount_cents"][i], dictionary[related] if related >= 0 else None)
+
+EXPORT_FORMATS = {"csv": (".csv", write_csv_chunk), "columnar": (".col", write_columnar_chunk)}
+
+def export_ledger(storage, output_prefix, export_format="csv", account_numbers=None, start=None, end=None,
+                  chunk_rows=100000, workers=4):
+    # Rows stream from storage into fixed-size chunks, and each chunk is
+    # written to its own file by the pool. At most two chunks per worker
+    # are held at once, so memory is bounded by chunk_rows, not the ledger.
+    extension, write_chunk = EXPORT_FORMATS[export_format]
+    directory = os.path.dirname(output_prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    rows = storage.iter_transactions(account_numbers, start, end)
+    paths = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for index, chunk in enumerate(_chunked(rows, chunk_rows)):
+            pending.append(executor.submit(write_chunk, f"{output_prefix}-{index:05d}{extension}", chunk))
+            if len(pending) >= workers * 2:
+                paths.append(pending.popleft().result())
+        while pending:
+            paths.append(pending.popleft().result())
+    return paths
+
+# Service Implementation
+class BankingService:
+    # Headless HTTP/JSON front end over the same Bank and UserManager the
+    # desktop app uses. Requests are served on one asyncio loop; anything
+    # that can block on disk or hashing runs in the executor.
+    STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                   405: "Method Not Allowed", 500: "Internal Server Error"}
+    
+    def __init__(self, bank, user_manager, executor=None, session_ttl=1800):
+        self.bank = bank
+        self.user_manager = user_manager
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=8)
+        # token -> (customer id, last used), least recently used first. A
+        # session idle for session_ttl seconds expires.
+        self.session_ttl = session_ttl
+        self.sessions = OrderedDict()
+        self.routes = {
+            ("POST", "/login"): self.login,
+            ("POST", "/logout"): self.logout,
+            ("GET", "/balance"): self.balance,
+            ("POST", "/deposit"): self.deposit,
+            ("POST", "/withdraw"): self.withdraw,
+            ("POST", "/transfer"): self.transfer,
+            ("GET", "/history"): self.history,
+            ("GET", "/metrics"): self.metrics,
+        }
+    
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle_connection, host, port)
+    
+    async def handle_connection(self, reader, writer):
         try:
-            with open("users.json", "r") as f:
-                self.users = json.load(f)
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, TypeError) as e:
+                    # Nothing after a malformed request can be framed
+                    # reliably, so the connection closes after the reply.
+                    await self._respond(writer, 400, {"error": f"Malformed request: {e}"})
+                    break
+                if request is None:
+                    break
+                started = time.perf_counter()
+                status, body = await self.dispatch(*request)
+                if METRICS.enabled and status != 404:
+                    METRICS.observe("service" + request[1].replace("/", "."), time.perf_counter() - started)
+                    METRICS.count(f"service.responses.{status}")
+                await self._respond(writer, status, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _respond(self, writer, status, body):
+        payload = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {self.STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+    
+    async def _read_request(self, reader):
+        # Raises ValueError or TypeError for anything that is not a request
+        # this service understands.
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length < 0:
+            raise ValueError("Negative Content-Length")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        params = dict(parse_qsl(query))
+        if body:
+            params.update(json.loads(body))
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        return method, path, params, token
+    
+    async def dispatch(self, method, path, params, token):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known = any(route_path == path for _, route_path in self.routes)
+            return (405 if known else 404), {"error": "Unknown endpoint"}
+        try:
+            if path in ("/login", "/metrics"):
+                return 200, await handler(params)
+            # Sessions hold customer ids rather than objects, since the bank's
+            # cache may drop and re-read a customer between requests.
+            customer_id = self._session(token)
+            customer = None if customer_id is None else await self._find(self.bank.find_customer, customer_id)
+            if customer is None:
+                return 401, {"error": "Not logged in"}
+            if path == "/logout":
+                return 200, await handler(token)
+            return 200, await handler(customer, params)
+        except KeyError as e:
+            return 400, {"error": f"Missing field {e.args[0]}"}
+        except LookupError as e:
+            return 404, {"error": str(e.args[0])}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
         except Exception as e:
-            print(f"Error loading users: {e}")
+            print(f"Error handling {method} {path}: {e}")
+            return 500, {"error": "Internal error"}
+    
+    def _session(self, token):
+        now = time.monotonic()
+        self._expire_sessions(now)
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        self.sessions[token] = (session[0], now)
+        self.sessions.move_to_end(token)
+        return session[0]
+    
+    def _expire_sessions(self, now):
+        # Oldest first, so this stops at the first session still in use.
+        while self.sessions:
+            token, (_, last_used) = next(iter(self.sessions.items()))
+            if now - last_used < self.session_ttl:
+                break
+            del self.sessions[token]
+    
+    def _run_blocking(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+    
+    async def _find(self, find, key):
+        # A lookup that misses may read from disk, so only a resident hit is
+        # answered on the loop; anything else goes to the executor.
+        found = find(key, load=False)
+        return found if found is not None else await self._run_blocking(find, key)
+    
+    def _own_account(self, customer, account_number):
+        account = customer.get_account(account_number)
+        if account is None:
+            raise LookupError("Account not found")
+        return account
+    
+    async def login(self, params):
+        customer_id = await asyncio.wrap_future(
+            self.user_manager.authenticate_async(params["username"], params["password"]))
+        customer = None if customer_id is None else await self._find(self.bank.find_customer, customer_id)
+        if customer is None:
+            raise ValueError("Invalid username or password")
+        token = secrets.token_hex(16)
+        now = time.monotonic()
+        self._expire_sessions(now)
+        self.sessions[token] = (customer.customer_id, now)
+        return {
+            "token": token,
+            "customer_id": customer.customer_id,
+            "accounts": [account.account_number for account in customer.accounts]
+        }
+    
+    async def logout(self, token):
+        del self.sessions[token]
+        return {"logged_out": True}
+    
+    async def metrics(self, params):
+        return {**METRICS.snapshot(), "bank_cache": self.bank.cache_info()}
+    
+    async def balance(self, customer, params):
+        account = self._own_account(customer, params["account_number"])
+        return {"account_number": account.account_number, "balance_cents": account.get_balance()}
+    
+    def _post(self, post, account, *args):
+        # The engine may post to the resident copy rather than the object
+        # passed in, if the cache reloaded the account, so the balance is
+        # read from that copy.
+        post(account, *args)
+        return self.bank.resident_copy(account).get_balance()
+    
+    async def deposit(self, customer, params):
+        account = self._own_account(customer, params["account_number"])
+        balance = await self._run_blocking(self._post, self.bank.deposit, account, parse_amount(params["amount"]))
+        return {"account_number": account.account_number, "balance_cents": balance}
+    
+    async def withdraw(self, customer, params):
+        account = self._own_account(customer, params["account_number"])
+        balance = await self._run_blocking(self._post, self.bank.withdraw, account, parse_amount(params["amount"]))
+        return {"account_number": account.account_number, "balance_cents": balance}
+    
+    async def transfer(self, customer, params):
+        account = self._own_account(customer, params["account_number"])
+        recipient_account = await self._find(self.bank.find_account, params["recipient_account"])
+        if recipient_account is None:
+            raise LookupError("Recipient account not found")
+        if recipient_account.account_number == account.account_number:
+            raise ValueError("Cannot transfer to the same account")
+        balance = await self._run_blocking(
+            self._post, self.bank.transfer, account, parse_amount(params["amount"]), recipient_account)
+        return {"account_number": account.account_number, "balance_cents": balance}
+    
+    async def history(self, customer, params):
+        account = self._own_account(customer, params["account_number"])
+        page = account.get_transaction_page(int(params.get("page", 0)), int(params.get("page_size", 50)))
+        return {
+            "account_number": account.account_number,
+            "total": len(account.get_transaction_history()),
+            "transactions": [
+                {
+                    "amount_cents": t.amount,
+                    "transaction_type": t.transaction_type,
+                    "timestamp": t.timestamp.isoformat(),
+                    "related_account": t.related_account
+                } for t in page
+            ]
+        }
+
+def serve(host="127.0.0.1", port=8080, db_path=None, shard_dir=None, preload=False, cache_size=None):
+    bank_storage, user_storage = open_storage(db_path, shard_dir, preload, lazy=cache_size is not None)
+    service = BankingService(Bank(bank_storage, cache_size=cache_size), UserManager(user_storage))
+    
+    async def run():
+        server = await service.start(host, port)
+        print(f"Serving on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown()
+        service.bank.save_data()
+        service.bank.close()
 
 # Frontend Implementation
 class BankingApp:
-    def __init__(self, root):
+    HISTORY_PAGE_SIZE = 100
+    
+    def __init__(self, root, bank_storage=None, user_storage=None, cache_size=None):
         self.root = root
         self.root.title("Online Banking System")
         self.root.geometry("800x600")
         
-        self.bank = Bank()
-        self.user_manager = UserManager()
+        self.bank = Bank(bank_storage, cache_size=cache_size)
+        self.user_manager = UserManager(user_storage)
+        # Postings wait on a journal fsync, so they run here instead of on
+        # the event thread. One worker keeps them in the order they were made.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-io")
         self.current_customer = None
         self.current_account = None
         
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         self.create_login_frame()
     
     def clear_frame(self):
@@ -261,7 +2698,7 @@ class BankingApp:
         
         tk.Button(button_frame, text="Login", command=self.login).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Register", command=self.create_register_frame).pack(side=tk.LEFT, padx=5)
-        tk.Button(button_frame, text="Exit", command=self.root.quit).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Exit", command=self.close).pack(side=tk.LEFT, padx=5)
     
     def create_register_frame(self):
         self.clear_frame()
@@ -330,7 +2767,7 @@ class BankingApp:
         account_info_frame.pack(pady=10)
         
         tk.Label(account_info_frame, 
-                text=f"Account: {self.current_account.account_number} | Balance: ${self.current_account.get_balance():.2f}",
+                text=f"Account: {self.current_account.account_number} | Balance: {format_cents(self.current_account.get_balance())}",
                 font=("Arial", 12)).pack()
         
         # Main buttons
@@ -420,15 +2857,21 @@ class BankingApp:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Create a listbox to display transactions
-        transaction_list = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, width=80, height=15)
-        transaction_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.transaction_list = tk.Listbox(list_frame, yscrollcommand=self.on_history_scroll, width=80, height=15)
+        self.transaction_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.history_scrollbar = scrollbar
         
         # Configure the scrollbar
-        scrollbar.config(command=transaction_list.yview)
+        scrollbar.config(command=self.transaction_list.yview)
+        
+        self.history_total = len(self.current_account.get_transaction_history())
+        self.history_status = tk.Label(self.root)
+        self.history_status.pack()
         
-        # Add transactions to the listbox
-        for transaction in self.current_account.get_transaction_history():
-            transaction_list.insert(tk.END, str(transaction))
+        # Only one page is formatted up front; further pages are fetched as
+        # the user scrolls towards the end of what is already loaded
+        self.history_page = 0
+        self.load_history_page()
         
         # Back button
         button_frame = tk.Frame(self.root)
@@ -436,6 +2879,20 @@ class BankingApp:
         
         tk.Button(button_frame, text="Back", command=self.create_main_menu).pack()
     
+    def load_history_page(self):
+        page = self.current_account.get_transaction_page(self.history_page, self.HISTORY_PAGE_SIZE)
+        if len(page) == 0:
+            return
+        self.transaction_list.insert(tk.END, *[str(transaction) for transaction in page])
+        self.history_page += 1
+        self.history_status.config(
+            text=f"Showing {self.transaction_list.size()} of {self.history_total} transactions")
+    
+    def on_history_scroll(self, first, last):
+        self.history_scrollbar.set(first, last)
+        if float(last) >= 0.9 and self.transaction_list.size() < self.history_total:
+            self.load_history_page()
+    
     def select_account(self, account_number):
         self.current_account = self.current_customer.get_account(account_number)
         self.create_main_menu()
@@ -448,16 +2905,32 @@ class BankingApp:
             messagebox.showerror("Error", "Please enter both username and password")
             return
         
-        customer_id = self.user_manager.authenticate(username, password)
+        # Password hashing is deliberately slow, so it runs on the user
+        # manager's worker pool while the mainloop keeps running.
+        self.wait_for(self.user_manager.authenticate_async(username, password), self.finish_login)
+    
+    def finish_login(self, customer_id):
         if customer_id is None:
             messagebox.showerror("Error", "Invalid username or password")
             return
         
-        self.current_customer = self.bank.find_customer(customer_id)
-        if self.current_customer is None:
+        # The lookup may read the customer in from disk.
+        self.wait_for(self.executor.submit(self.open_customer, customer_id), self.show_customer)
+    
+    def open_customer(self, customer_id):
+        customer = self.bank.find_customer(customer_id)
+        if customer is not None:
+            # The screens keep this customer's objects, so the bank's cache
+            # must not drop it until logout.
+            self.bank.pin(customer)
+        return customer
+    
+    def show_customer(self, customer):
+        if customer is None:
             messagebox.showerror("Error", "Customer not found")
             return
         
+        self.current_customer = customer
         self.create_main_menu()
     
     def register(self):
@@ -472,82 +2945,368 @@ class BankingApp:
             messagebox.showerror("Error", "Please fill in all fields")
             return
         
-        if self.bank.find_customer(customer_id) is not None:
-            messagebox.showerror("Error", "Customer ID already exists")
-            return
-        
         # Create new customer with a default account
         new_customer = Customer(customer_id, name, email, phone)
-        new_account = Account(f"ACC-{customer_id}", new_customer, 0.0)
+        new_account = Account(f"ACC-{customer_id}", new_customer, 0)
         new_customer.add_account(new_account)
-        self.bank.add_customer(new_customer)
+        self.wait_for(self.executor.submit(self.attempt, self.create_customer, new_customer),
+                      lambda error: self.finish_add_customer(error, username, password, customer_id))
+    
+    def create_customer(self, customer):
+        # Runs on the executor like a posting: the lookup may read from disk
+        # and adding the customer waits on a journal fsync.
+        if self.bank.find_customer(customer.customer_id) is not None:
+            raise ValueError("Customer ID already exists")
+        self.bank.add_customer(customer)
+    
+    def finish_add_customer(self, error, username, password, customer_id):
+        if error is not None:
+            messagebox.showerror("Error", error)
+            return
         
-        if not self.user_manager.register_user(username, password, customer_id):
+        self.wait_for(self.user_manager.register_user_async(username, password, customer_id),
+                      self.finish_register)
+    
+    def finish_register(self, registered):
+        if not registered:
             messagebox.showerror("Error", "Username already exists")
             return
         
         messagebox.showinfo("Success", "Registration successful! Please login.")
         self.create_login_frame()
     
+    def wait_for(self, future, callback):
+        if not future.done():
+            self.root.after(20, self.wait_for, future, callback)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            # E.g. an I/O error or a stored hash in an unknown format. Raised
+            # in an after() callback it would only reach stderr, leaving the
+            # screen as it was with no word to the user.
+            messagebox.showerror("Error", str(e))
+            return
+        callback(result)
+    
     def process_deposit(self):
         try:
-            amount = float(self.deposit_amount.get())
+            amount = parse_amount(self.deposit_amount.get())
             if amount <= 0:
                 raise ValueError("Amount must be positive")
-            
-            self.current_account.deposit(amount)
-            self.bank.save_data()
-            
-            messagebox.showinfo("Success", f"Deposited ${amount:.2f} successfully")
-            self.create_main_menu()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        
+        self.post(self.bank.deposit, (self.current_account, amount),
+                  f"Deposited {format_cents(amount)} successfully")
     
     def process_withdraw(self):
         try:
-            amount = float(self.withdraw_amount.get())
+            amount = parse_amount(self.withdraw_amount.get())
             if amount <= 0:
                 raise ValueError("Amount must be positive")
-            
-            self.current_account.withdraw(amount)
-            self.bank.save_data()
-            
-            messagebox.showinfo("Success", f"Withdrew ${amount:.2f} successfully")
-            self.create_main_menu()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        
+        self.post(self.bank.withdraw, (self.current_account, amount),
+                  f"Withdrew {format_cents(amount)} successfully")
     
     def process_transfer(self):
         try:
             recipient_account_number = self.recipient_account.get()
-            amount = float(self.transfer_amount.get())
+            amount = parse_amount(self.transfer_amount.get())
             
             if amount <= 0:
                 raise ValueError("Amount must be positive")
             
-            recipient_account = self.bank.find_account(recipient_account_number)
-            if recipient_account is None:
-                raise ValueError("Recipient account not found")
-            
-            if recipient_account.account_number == self.current_account.account_number:
+            if recipient_account_number == self.current_account.account_number:
                 raise ValueError("Cannot transfer to the same account")
-            
-            self.current_account.transfer(amount, recipient_account)
-            self.bank.save_data()
-            
-            messagebox.showinfo("Success", 
-                              f"Transferred ${amount:.2f} to account {recipient_account_number}")
-            self.create_main_menu()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        
+        self.post(self.transfer_to, (self.current_account, amount, recipient_account_number),
+                  f"Transferred {format_cents(amount)} to account {recipient_account_number}")
+    
+    def transfer_to(self, account, amount, recipient_account_number):
+        # Runs on the executor, where looking the recipient up may read it in.
+        recipient_account = self.bank.find_account(recipient_account_number)
+        if recipient_account is None:
+            raise ValueError("Recipient account not found")
+        self.bank.transfer(account, amount, recipient_account)
+    
+    def post(self, operation, args, message):
+        # The success dialog still only appears once the posting is durable.
+        self.wait_for(self.executor.submit(self.attempt, operation, *args),
+                      lambda error: self.finish_post(error, message))
+    
+    @staticmethod
+    def attempt(operation, *args):
+        try:
+            operation(*args)
+        except Exception as e:
+            return str(e)
+        return None
+    
+    def finish_post(self, error, message):
+        if error is not None:
+            messagebox.showerror("Error", error)
+            return
+        
+        messagebox.showinfo("Success", message)
+        self.create_main_menu()
     
     def logout(self):
+        # Durability barrier: the background snapshot catches up, behind any
+        # postings still queued, before the next user gets the login screen.
+        self.wait_for(self.executor.submit(self.attempt, self.bank.flush), self.finish_logout)
+    
+    def finish_logout(self, error):
+        if error is not None:
+            messagebox.showerror("Error", f"Could not save data: {error}")
+        if self.current_customer is not None:
+            self.bank.unpin(self.current_customer)
         self.current_customer = None
         self.current_account = None
         self.create_login_frame()
+    
+    def close(self):
+        self.executor.shutdown()
+        error = self.attempt(self.bank.close)
+        if error is not None:
+            print(f"Error saving data: {error}")
+        self.root.destroy()
+
+# Instrumentation
+class Metrics:
+    # Opt-in timers and counters. Nothing is measured until enable() swaps
+    # timing wrappers onto the methods listed in instrumented_methods(), so
+    # the hot paths cost nothing extra when metrics are off. Each timer
+    # keeps its most recent samples for the percentile estimates.
+    QUANTILES = (0.5, 0.99)
+    
+    def __init__(self, window=1024):
+        self.window = window
+        self.enabled = False
+        self._counters = Counter()
+        self._timers = {}
+        self._originals = []
+        self._lock = threading.Lock()
+    
+    def enable(self):
+        if self.enabled:
+            return
+        for owner, prefix, names in instrumented_methods():
+            for attribute in names:
+                original = owner.__dict__[attribute]
+                self._originals.append((owner, attribute, original))
+                setattr(owner, attribute, self._wrap(original, f"{prefix}.{attribute}"))
+        self.enabled = True
+    
+    def disable(self):
+        while self._originals:
+            owner, attribute, original = self._originals.pop()
+            setattr(owner, attribute, original)
+        self.enabled = False
+    
+    def _wrap(self, fn, name):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                self.count(f"{name}.errors")
+                raise
+            finally:
+                self.observe(name, time.perf_counter() - started)
+        timed.__name__ = fn.__name__
+        timed.__wrapped__ = fn
+        return timed
+    
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+    
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = [0, 0.0, 0.0, deque(maxlen=self.window)]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+            timer[3].append(seconds)
+    
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+    
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {name: (count, total, slowest, sorted(samples))
+                      for name, (count, total, slowest, samples) in self._timers.items()}
+        operations = {}
+        for name, (count, total, slowest, samples) in sorted(timers.items()):
+            operations[name] = {"count": count, "total_seconds": total, "max_seconds": slowest}
+            for quantile in self.QUANTILES:
+                index = min(len(samples) - 1, int(quantile * len(samples)))
+                operations[name][f"p{round(quantile * 100)}_seconds"] = samples[index]
+        return {"counters": dict(sorted(counters.items())), "operations": operations}
+    
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = ["# TYPE bank_operation_seconds summary"]
+        for name, stats in snapshot["operations"].items():
+            for quantile in self.QUANTILES:
+                value = stats[f"p{round(quantile * 100)}_seconds"]
+                lines.append(f'bank_operation_seconds{{operation="{name}",quantile="{quantile}"}} {value!r}')
+            lines.append(f'bank_operation_seconds_sum{{operation="{name}"}} {stats["total_seconds"]!r}')
+            lines.append(f'bank_operation_seconds_count{{operation="{name}"}} {stats["count"]}')
+        lines.append("# TYPE bank_events_total counter")
+        for name, value in snapshot["counters"].items():
+            lines.append(f'bank_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+    
+    def write(self, path):
+        # .prom files get Prometheus text exposition format, anything else JSON.
+        if path.endswith(".prom"):
+            write_atomic(path, self.to_prometheus())
+        else:
+            write_atomic(path, json.dumps(self.snapshot(), indent=4))
+
+def instrumented_methods():
+    return [
+        (Account, "account", ("deposit", "withdraw", "transfer", "query_transactions",
+                               "get_transaction_page", "statement")),
+        (Customer, "customer", ("get_account",)),
+        (Bank, "bank", ("add_customer", "find_customer", "find_account", "deposit", "withdraw",
+                        "transfer", "post_batch", "save_data", "load_data", "flush")),
+        (TransactionJournal, "journal", ("append",)),
+        (JsonStorage, "json_storage", ("load", "save", "save_customer", "record_transactions", "flush")),
+        (ShardedStorage, "sharded_storage", ("load", "load_missing", "save", "save_customer",
+                                             "record_transactions")),
+        (JsonUserStorage, "json_users", ("get_user", "add_user", "add_users")),
+        (SQLiteStorage, "sqlite_storage", ("load", "save", "save_customer", "record_transactions",
+                                           "get_user", "add_user", "add_users")),
+        (UserManager, "users", ("authenticate", "register_user", "register_users")),
+        (BankingApp, "ui", ("create_main_menu", "show_transaction_history", "load_history_page")),
+    ]
+
+METRICS = Metrics()
 
 # Main application
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online Banking System")
+    parser.add_argument("--db", help="use the SQLite database at this path instead of bank_data.json/users.json")
+    parser.add_argument("--shards", help="use the sharded layout in this directory instead of bank_data.json")
+    parser.add_argument("--preload", action="store_true", help="with --shards, load every shard at startup")
+    parser.add_argument("--cache-size", type=int, help="keep at most this many customers in memory, reading "
+                                                         "others in on demand (needs --shards or --db)")
+    parser.add_argument("--metrics", help="time banking operations and write a snapshot here on exit "
+                                          "(.prom for Prometheus text, otherwise JSON)")
+    parser.add_argument("--profile", help="capture a cProfile of the whole run to this file")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    migrate = subparsers.add_parser("migrate", help="copy bank_data.json and users.json into a SQLite database")
+    migrate.add_argument("target", help="path of the SQLite database to create")
+    migrate.add_argument("--data-file", default="bank_data.json")
+    migrate.add_argument("--journal-file", default="bank_journal.log")
+    migrate.add_argument("--users-file", default="users.json")
+    
+    shard = subparsers.add_parser("shard", help="split bank_data.json into a sharded directory")
+    shard.add_argument("directory", help="directory to write the shards to")
+    shard.add_argument("--count", type=int, default=16, help="number of shards")
+    shard.add_argument("--data-file", default="bank_data.json")
+    shard.add_argument("--journal-file", default="bank_journal.log")
+    
+    reconcile = subparsers.add_parser("reconcile", help="check balances and transfer pairs in bank_data.json")
+    reconcile.add_argument("--data-file", default="bank_data.json")
+    reconcile.add_argument("--journal-file", default="bank_journal.log")
+    reconcile.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    reconcile.add_argument("--output", help="write the JSON report here instead of stdout")
+    
+    export = subparsers.add_parser("export", help="stream transactions to chunked CSV or columnar files")
+    export.add_argument("output", help="output path prefix; chunks are written as <output>-00000.<ext>")
+    export.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    export.add_argument("--account", action="append", dest="accounts", help="limit to this account (repeatable)")
+    export.add_argument("--start", type=datetime.fromisoformat, help="first timestamp to include (ISO format)")
+    export.add_argument("--end", type=datetime.fromisoformat, help="timestamp to stop before (ISO format)")
+    export.add_argument("--chunk-rows", type=int, default=100000)
+    export.add_argument("--workers", type=int, default=4)
+    
+    server = subparsers.add_parser("serve", help="run the headless HTTP/JSON service")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8080)
+    
+    args = parser.parse_args(argv)
+    if args.cache_size is not None and not (args.db or args.shards):
+        # bank_data.json is read whole, so there is nothing to evict.
+        parser.error("--cache-size needs --shards or --db")
+    
+    # BANK_METRICS=1 turns timing on without a snapshot file, e.g. for a
+    # service scraped through GET /metrics.
+    if args.metrics or os.environ.get("BANK_METRICS") == "1":
+        METRICS.enable()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        run_command(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.metrics:
+            METRICS.write(args.metrics)
+
+def run_command(args):
+    if args.command == "migrate":
+        counts = migrate_to_sqlite(args.target, args.data_file, args.journal_file, args.users_file)
+        print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" migrated to {args.target}")
+        return
+    
+    if args.command == "shard":
+        counts = migrate_to_shards(args.directory, args.count, args.data_file, args.journal_file)
+        print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" written to {args.directory}")
+        return
+    
+    if args.command == "reconcile":
+        report = reconcile_file(args.data_file, args.journal_file, args.processes)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=4)
+        else:
+            print(json.dumps(report, indent=4))
+        raise SystemExit(0 if report["ok"] else 1)
+    
+    if args.command == "export":
+        storage = open_storage(args.db, args.shards)[0]
+        accounts = set(args.accounts) if args.accounts else None
+        for path in export_ledger(storage, args.output, args.format, accounts, args.start, args.end,
+                                  args.chunk_rows, args.workers):
+            print(path)
+        return
+    
+    if args.command == "serve":
+        serve(args.host, args.port, args.db, args.shards, args.preload, args.cache_size)
+        return
+    
     root = tk.Tk()
-    app = BankingApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = BankingApp(root, *open_storage(args.db, args.shards, args.preload, lazy=args.cache_size is not None),
+                     cache_size=args.cache_size)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,903 @@
+import argparse
+from decimal import Decimal
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app import (Account, Bank, BankingApp, BankingService, Customer, JsonStorage, JsonUserStorage, Pbkdf2Hasher,
+                 ScryptHasher, Sha256Hasher, ShardedStorage, SQLiteStorage, TransactionStore, UserManager,
+                 format_cents, migrate_to_shards, migrate_to_sqlite, reconcile_file)
+
+
+def generate_dataset(path, customers, transactions_per_account, accounts_per_customer=1, transfer_ratio=0.0,
+                     users_file=None, hasher=None, seed=42):
+    # Writes a bank_data.json with customers * accounts_per_customer
+    # accounts. Every account opens with a deposit; after that, events hit
+    # random accounts and a transfer_ratio share of them are transfers,
+    # written as matching Transfer Out / Transfer In legs with the same
+    # timestamp so the file reconciles. transactions_per_account is the
+    # average number of rows per account. With users_file, also registers
+    # user<i> / "password" for every customer in the log JsonUserStorage
+    # keeps next to it (users.json -> users.log).
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    account_numbers = [f"ACC-{n}" for n in range(customers * accounts_per_customer)]
+    balances = [0] * len(account_numbers)
+    histories = [[] for _ in account_numbers]
+
+    def post(index, amount, transaction_type, timestamp, related_account=None):
+        histories[index].append({
+            "amount_cents": amount,
+            "transaction_type": transaction_type,
+            "timestamp": timestamp.isoformat(),
+            "account_number": account_numbers[index],
+            "related_account": related_account
+        })
+        balances[index] += amount if transaction_type in ("Deposit", "Transfer In") else -amount
+
+    for index in range(len(account_numbers)):
+        post(index, rng.randint(10000, 1000000), "Deposit", start)
+
+    transfers = 0
+    remaining = len(account_numbers) * (transactions_per_account - 1)
+    clock = 0
+    while remaining > 0:
+        clock += 1
+        timestamp = start + timedelta(seconds=clock)
+        index = rng.randrange(len(account_numbers))
+        if (remaining > 1 and len(account_numbers) > 1 and balances[index] > 0
+                and rng.random() < transfer_ratio):
+            target = rng.randrange(len(account_numbers) - 1)
+            if target >= index:
+                target += 1
+            amount = rng.randint(1, max(1, balances[index] // 4))
+            post(index, amount, "Transfer Out", timestamp, account_numbers[target])
+            post(target, amount, "Transfer In", timestamp, account_numbers[index])
+            transfers += 1
+            remaining -= 2
+        else:
+            amount = rng.randint(1, 50000)
+            transaction_type = "Deposit" if balances[index] < amount or rng.random() < 0.5 else "Withdrawal"
+            post(index, amount, transaction_type, timestamp)
+            remaining -= 1
+
+    data = {"customers": []}
+    for i in range(customers):
+        data["customers"].append({
+            "customer_id": str(i),
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": "5555555555",
+            "accounts": [{
+                "account_number": account_numbers[index],
+                "balance_cents": balances[index],
+                "account_type": "Checking" if index % 2 else "Savings",
+                "transactions": histories[index]
+            } for index in range(i * accounts_per_customer, (i + 1) * accounts_per_customer)]
+        })
+    with open(path, "w") as f:
+        # Same layout as the snapshots JsonStorage writes.
+        json.dump(data, f, indent=4)
+
+    if users_file is not None:
+        hasher = hasher if hasher is not None else Sha256Hasher()
+        JsonUserStorage(users_file).add_users(
+            (f"user{i}", {"password": hasher.hash("password"), "customer_id": str(i)}) for i in range(customers))
+
+    return {
+        "customers": customers,
+        "accounts": len(account_numbers),
+        "transactions": sum(len(history) for history in histories),
+        "transfers": transfers,
+        "file_bytes": os.path.getsize(path)
+    }
+
+
+def bench_startup(sizes, transactions_per_account, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        journal_file = os.path.join(directory, "bank_journal.log")
+        for customers in sizes:
+            generate_dataset(data_file, customers, transactions_per_account)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                Bank(JsonStorage(data_file, journal_file))
+                timings.append(time.perf_counter() - started)
+            results.append({
+                "benchmark": "startup",
+                "customers": customers,
+                "transactions": customers * transactions_per_account,
+                "file_bytes": os.path.getsize(data_file),
+                "seconds": min(timings)
+            })
+    return results
+
+
+def bench_lookup(sizes, lookups):
+    results = []
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        bank = Bank(JsonStorage(os.path.join(directory, "bank_data.json"),
+                                os.path.join(directory, "bank_journal.log")))
+        created = 0
+        for size in sorted(sizes):
+            customers = []
+            for i in range(created, size):
+                customer = Customer(str(i), f"Customer {i}", f"customer{i}@example.com", "5555555555")
+                customer.add_account(Account(f"ACC-{i}", customer))
+                customers.append(customer)
+            bank._register_customers(customers)
+            created = size
+
+            keys = [rng.randrange(size) for _ in range(lookups)]
+            account_numbers = [f"ACC-{k}" for k in keys]
+            customer_ids = [str(k) for k in keys]
+
+            started = time.perf_counter()
+            for account_number in account_numbers:
+                bank.find_account(account_number)
+            account_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for customer_id in customer_ids:
+                bank.find_customer(customer_id)
+            customer_seconds = time.perf_counter() - started
+
+            results.append({
+                "benchmark": "lookup",
+                "accounts": size,
+                "find_account_ns": account_seconds / lookups * 1e9,
+                "find_customer_ns": customer_seconds / lookups * 1e9
+            })
+    return results
+
+
+def bench_memory(sizes, transactions_per_account):
+    # Parse overhead is the traced peak minus what the loaded model retains;
+    # for the streaming loader it should stay flat as the file grows.
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        journal_file = os.path.join(directory, "bank_journal.log")
+        for customers in sizes:
+            generate_dataset(data_file, customers, transactions_per_account)
+
+            tracemalloc.start()
+            bank = Bank(JsonStorage(data_file, journal_file))
+            streaming_retained, streaming_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del bank
+
+            tracemalloc.start()
+            bank = Bank(JsonStorage(os.path.join(directory, "missing.json"), journal_file))
+            with open(data_file) as f:
+                data = json.load(f)
+            bank._register_customers(bank.storage._customer_from_dict(c) for c in data["customers"])
+            del data
+            eager_retained, eager_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del bank
+
+            results.append({
+                "benchmark": "memory",
+                "customers": customers,
+                "file_bytes": os.path.getsize(data_file),
+                "retained_bytes": streaming_retained,
+                "streaming_overhead_bytes": streaming_peak - streaming_retained,
+                "json_load_overhead_bytes": eager_peak - eager_retained
+            })
+    return results
+
+
+class LegacyTransaction:
+    # The pre-columnar Transaction layout: one object with a __dict__ and a
+    # datetime per row, kept here only as the "before" figure.
+    def __init__(self, amount, transaction_type, account_number, related_account=None):
+        self.amount = amount
+        self.transaction_type = transaction_type
+        self.timestamp = datetime.now()
+        self.account_number = account_number
+        self.related_account = related_account
+
+
+def bench_transaction_bytes(count):
+    start = datetime(2024, 1, 1)
+    rows = [(i % 50000 + 1, "Transfer Out" if i % 3 else "Deposit",
+             start + timedelta(seconds=i), "ACC-2" if i % 3 else None) for i in range(count)]
+
+    tracemalloc.start()
+    legacy = []
+    for amount, transaction_type, timestamp, related_account in rows:
+        transaction = LegacyTransaction(amount / 100, transaction_type, "ACC-1", related_account)
+        transaction.timestamp = timestamp + timedelta(microseconds=1)
+        legacy.append(transaction)
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del legacy
+
+    tracemalloc.start()
+    store = TransactionStore("ACC-1")
+    for amount, transaction_type, timestamp, related_account in rows:
+        store.add(amount, transaction_type, timestamp, related_account)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return [{
+        "benchmark": "transaction_bytes",
+        "transactions": count,
+        "object_bytes_per_transaction": legacy_bytes / count,
+        "columnar_bytes_per_transaction": store_bytes / count
+    }]
+
+
+def bench_query(count, queries):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    account = Account("ACC-1", None)
+    types = ["Deposit", "Withdrawal", "Transfer In", "Transfer Out"]
+    for i in range(count):
+        transaction_type = types[i % 4]
+        related_account = f"ACC-{i % 50 + 2}" if transaction_type.startswith("Transfer") else None
+        account.transactions.add(rng.randint(1, 100000), transaction_type,
+                                 start + timedelta(minutes=i), related_account)
+    history = list(account.get_transaction_history())
+
+    windows = []
+    for _ in range(queries):
+        first = start + timedelta(minutes=rng.randrange(count))
+        windows.append((first, first + timedelta(days=1), rng.choice(types)))
+
+    started = time.perf_counter()
+    naive_rows = 0
+    for first, last, transaction_type in windows:
+        naive_rows += len([t for t in history
+                           if first <= t.timestamp < last and t.transaction_type == transaction_type])
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed_rows = 0
+    for first, last, transaction_type in windows:
+        indexed_rows += len(account.query_transactions(start=first, end=last,
+                                                       transaction_type=transaction_type))
+    indexed_seconds = time.perf_counter() - started
+
+    assert naive_rows == indexed_rows
+    return [{
+        "benchmark": "query",
+        "transactions": count,
+        "rows_per_query": indexed_rows / queries,
+        "naive_ms": naive_seconds / queries * 1000,
+        "indexed_ms": indexed_seconds / queries * 1000
+    }]
+
+
+class NullStorage:
+    # Keeps the engine benchmark about locking rather than disk I/O.
+    def load(self, bank):
+        pass
+
+    def save(self, bank):
+        pass
+
+    def save_customer(self, bank, customer, accounts=None):
+        pass
+
+    def record_transactions(self, bank, transactions):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def load_missing(self, bank, customer_id=None, account_number=None):
+        pass
+
+    def all_resident(self):
+        return True
+
+    def largest_eviction_group(self):
+        return None
+
+    def eviction_group(self, bank, customer):
+        return None
+
+    def evict(self, bank, customers):
+        pass
+
+
+def make_storage(kind, directory):
+    if kind == "json":
+        return JsonStorage(os.path.join(directory, "bank_data.json"), os.path.join(directory, "bank_journal.log"))
+    if kind == "sqlite":
+        return SQLiteStorage(os.path.join(directory, "bank.db"))
+    return NullStorage()
+
+
+def bench_transfers(thread_counts, accounts, transfers, storage_kind):
+    results = []
+    for threads in thread_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            bank = Bank(make_storage(storage_kind, directory))
+            customers = []
+            for i in range(accounts):
+                customer = Customer(str(i), f"Customer {i}", f"customer{i}@example.com", "5555555555")
+                customer.add_account(Account(f"ACC-{i}", customer, 100000))
+                customers.append(customer)
+            bank._register_customers(customers)
+            bank.save_data()
+            total_before = sum(account.balance for account in bank.accounts)
+            all_accounts = list(bank.accounts)
+
+            failures = []
+
+            def worker(seed):
+                rng = random.Random(seed)
+                for _ in range(transfers // threads):
+                    # Few accounts and both directions make lock-order
+                    # mistakes show up as deadlocks quickly.
+                    source, target = rng.sample(all_accounts, 2)
+                    try:
+                        bank.transfer(source, rng.randint(1, 5000), target)
+                    except ValueError:
+                        failures.append(1)
+
+            workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            total_after = sum(account.balance for account in bank.accounts)
+            completed = transfers // threads * threads
+            results.append({
+                "benchmark": "transfers",
+                "storage": storage_kind,
+                "threads": threads,
+                "transfers": completed,
+                "rejected": len(failures),
+                "transfers_per_second": completed / elapsed,
+                "money_conserved": total_after == total_before
+            })
+            bank.close()
+    return results
+
+
+class ServiceClient:
+    # Minimal keep-alive HTTP/JSON client for load-testing BankingService.
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.token = ""
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Authorization: Bearer {self.token}\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bench_service(client_counts, requests_per_client, storage_kind):
+    results = []
+    for clients in client_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            storage = make_storage(storage_kind, directory)
+            bank = Bank(storage)
+            user_storage = storage if storage_kind == "sqlite" else JsonUserStorage(os.path.join(directory, "users.json"))
+            user_manager = UserManager(user_storage, Pbkdf2Hasher(1000))
+            customers = []
+            for i in range(clients):
+                customer = Customer(str(i), f"Customer {i}", f"customer{i}@example.com", "5555555555")
+                customer.add_account(Account(f"ACC-{i}", customer, 100000))
+                customers.append(customer)
+                user_manager.register_user(f"user{i}", "password", str(i))
+            bank._register_customers(customers)
+            bank.save_data()
+            service = BankingService(bank, user_manager)
+
+            async def login(i, port):
+                connection = await ServiceClient.connect("127.0.0.1", port)
+                _, session = await connection.request("POST", "/login", {"username": f"user{i}", "password": "password"})
+                connection.token = session["token"]
+                return connection
+
+            async def client(i, connection, latencies):
+                account_number = f"ACC-{i}"
+                for n in range(requests_per_client):
+                    if n % 4 == 0:
+                        request = ("POST", "/deposit", {"account_number": account_number, "amount": 5})
+                    elif n % 4 == 1 and clients > 1:
+                        request = ("POST", "/transfer", {"account_number": account_number, "amount": 1,
+                                                         "recipient_account": f"ACC-{(i + 1) % clients}"})
+                    elif n % 4 in (1, 2):
+                        request = ("GET", f"/balance?account_number={account_number}", None)
+                    else:
+                        request = ("GET", f"/history?account_number={account_number}&page_size=20", None)
+                    started = time.perf_counter()
+                    status, _ = await connection.request(*request)
+                    latencies.append(time.perf_counter() - started)
+                    assert status == 200, status
+                await connection.close()
+
+            async def run():
+                server = await service.start("127.0.0.1", 0)
+                port = server.sockets[0].getsockname()[1]
+                # Logins are measured by the 'login' benchmark; only the
+                # account traffic is timed here.
+                connections = await asyncio.gather(*(login(i, port) for i in range(clients)))
+                latencies = []
+                started = time.perf_counter()
+                await asyncio.gather(*(client(i, connection, latencies) for i, connection in enumerate(connections)))
+                elapsed = time.perf_counter() - started
+                server.close()
+                await server.wait_closed()
+                return latencies, elapsed
+
+            latencies, elapsed = asyncio.run(run())
+            service.executor.shutdown()
+            results.append({
+                "benchmark": "service",
+                "storage": storage_kind,
+                "clients": clients,
+                "requests": len(latencies),
+                "requests_per_second": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 0.5) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000
+            })
+            storage.close()
+    return results
+
+
+def parse_hasher(spec):
+    name, *params = spec.split(":")
+    if name == "sha256":
+        return Sha256Hasher()
+    if name == "pbkdf2":
+        return Pbkdf2Hasher(*map(int, params))
+    if name == "scrypt":
+        return ScryptHasher(*map(int, params))
+    raise ValueError(f"Unknown hasher {spec!r}")
+
+
+def bench_login(specs, users, logins, workers):
+    results = []
+    for spec in specs:
+        with tempfile.TemporaryDirectory() as directory:
+            storage = JsonUserStorage(os.path.join(directory, "users.json"))
+            for cached in (False, True):
+                user_manager = UserManager(storage, parse_hasher(spec), workers, cache_size=users if cached else 0)
+                list(user_manager.executor.map(
+                    lambda i: user_manager.register_user(f"user{i}", "password", str(i)), range(users)))
+                if cached:
+                    # Warm the cache with one verified login per user.
+                    for future in [user_manager.authenticate_async(f"user{i}", "password") for i in range(users)]:
+                        future.result()
+
+                started = time.perf_counter()
+                futures = [user_manager.authenticate_async(f"user{i % users}", "password") for i in range(logins)]
+                assert all(future.result() is not None for future in futures)
+                elapsed = time.perf_counter() - started
+                user_manager.executor.shutdown()
+
+                results.append({
+                    "benchmark": "login",
+                    "hasher": spec,
+                    "cached": cached,
+                    "workers": workers,
+                    "logins_per_second": logins / elapsed,
+                    "mean_ms": elapsed / logins * workers * 1000
+                })
+    return results
+
+
+def bench_money(postings):
+    # Applies the same postings (deposit / guarded withdrawal) to a balance
+    # held as float dollars, Decimal and integer cents, then formats it.
+    rng = random.Random(42)
+    cents = [rng.randint(1, 100000) for _ in range(postings)]
+    representations = {
+        "float": ([c / 100 for c in cents], 0.0, lambda balance: f"${balance:.2f}"),
+        "decimal": ([Decimal(c).scaleb(-2) for c in cents], Decimal("0.00"), lambda balance: f"${balance:.2f}"),
+        "int_cents": (cents, 0, format_cents),
+    }
+    results = []
+    for name, (amounts, balance, formatter) in representations.items():
+        started = time.perf_counter()
+        for i, amount in enumerate(amounts):
+            if i % 3 == 2:
+                if balance >= amount:
+                    balance -= amount
+            else:
+                balance += amount
+        text = formatter(balance)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "benchmark": "money",
+            "representation": name,
+            "postings": postings,
+            "postings_per_second": postings / elapsed,
+            "final_balance": text
+        })
+    return results
+
+
+def bench_reconcile(customers, transactions_per_account, process_counts):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        journal_file = os.path.join(directory, "bank_journal.log")
+        generate_dataset(data_file, customers, transactions_per_account)
+        for processes in process_counts:
+            report = reconcile_file(data_file, journal_file, processes)
+            assert report["ok"], report
+            results.append({
+                "benchmark": "reconcile",
+                "processes": processes,
+                "accounts": report["accounts"],
+                "transactions": report["transactions"],
+                "seconds": report["seconds"],
+                "transactions_per_second": report["transactions"] / report["seconds"]
+            })
+    return results
+
+
+def bench_cache(customers, cache_sizes, lookups, hot_fraction, storage_kind):
+    # Lookups where 90% of requests go to a hot_fraction of the accounts,
+    # against customer budgets. Shards are read and evicted whole, so the
+    # sharded store needs a larger budget than SQLite for the same hit ratio;
+    # they hold about 25 customers each so the smallest budgets still fit one.
+    rng = random.Random(42)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        journal_file = os.path.join(directory, "bank_journal.log")
+        dataset = generate_dataset(data_file, customers, 20, accounts_per_customer=2, transfer_ratio=0.5)
+        if storage_kind == "sqlite":
+            db_path = os.path.join(directory, "bank.db")
+            migrate_to_sqlite(db_path, data_file, journal_file, os.path.join(directory, "users.json"))
+        else:
+            shard_dir = os.path.join(directory, "shards")
+            migrate_to_shards(shard_dir, max(1, customers // 25), data_file, journal_file)
+
+        account_numbers = [f"ACC-{n}" for n in range(dataset["accounts"])]
+        rng.shuffle(account_numbers)
+        hot = account_numbers[:max(1, int(len(account_numbers) * hot_fraction))]
+        keys = [rng.choice(hot) if rng.random() < 0.9 else rng.choice(account_numbers) for _ in range(lookups)]
+
+        for cache_size in cache_sizes:
+            storage = SQLiteStorage(db_path, lazy=True) if storage_kind == "sqlite" else ShardedStorage(shard_dir)
+            tracemalloc.start()
+            bank = Bank(storage, cache_size=cache_size)
+            started = time.perf_counter()
+            for account_number in keys:
+                bank.find_account(account_number)
+            elapsed = time.perf_counter() - started
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            info = bank.cache_info()
+            results.append({
+                "benchmark": "cache",
+                "storage": storage_kind,
+                "customers": customers,
+                "cache_size": cache_size,
+                "hit_ratio": info["hits"] / lookups,
+                "evictions": info["evictions"],
+                "resident": info["resident"],
+                "retained_bytes": retained,
+                "lookups_per_second": lookups / elapsed
+            })
+            storage.close()
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds")
+    }
+
+
+def timed_runs(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def suite_result(operation, seconds, ops, **extra):
+    return {
+        "benchmark": "suite",
+        "operation": operation,
+        "ops": ops,
+        "seconds": seconds,
+        "ops_per_second": ops / seconds,
+        "us_per_op": seconds / ops * 1e6,
+        **extra
+    }
+
+
+def bench_suite(customers, accounts_per_customer, transactions_per_account, transfer_ratio, operations, logins,
+                hasher_spec, repeat, seed):
+    # One generated dataset, then the operations users actually wait on.
+    # Each figure is the best of `repeat` runs.
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        journal_file = os.path.join(directory, "bank_journal.log")
+        users_file = os.path.join(directory, "users.json")
+        dataset = generate_dataset(data_file, customers, transactions_per_account, accounts_per_customer,
+                                   transfer_ratio, users_file, parse_hasher(hasher_spec), seed)
+
+        seconds = timed_runs(lambda: Bank(JsonStorage(data_file, journal_file)), repeat)
+        results.append(suite_result("load_data", seconds, 1, transactions=dataset["transactions"]))
+
+        bank = Bank(JsonStorage(data_file, journal_file))
+        seconds = timed_runs(bank.save_data, repeat)
+        results.append(suite_result("save_data", seconds, 1, file_bytes=os.path.getsize(data_file)))
+
+        all_accounts = list(bank.accounts)
+        account_numbers = [rng.choice(all_accounts).account_number for _ in range(operations)]
+        seconds = timed_runs(lambda: [bank.find_account(number) for number in account_numbers], repeat)
+        results.append(suite_result("find_account", seconds, operations))
+
+        pairs = [rng.sample(all_accounts, 2) for _ in range(operations)]
+        # Enough headroom that no repeat runs a source account dry.
+        for account in bank.accounts:
+            account.deposit(operations * (repeat + 1))
+
+        def transfer_all():
+            for source, target in pairs:
+                source.transfer(1, target)
+        seconds = timed_runs(transfer_all, repeat)
+        results.append(suite_result("account_transfer", seconds, operations))
+
+        # The durable path: engine locks plus an fsync'd journal append each.
+        durable = pairs[:max(1, operations // 100)]
+
+        def bank_transfer_all():
+            for source, target in durable:
+                bank.transfer(source, 1, target)
+        seconds = timed_runs(bank_transfer_all, repeat)
+        results.append(suite_result("bank_transfer", seconds, len(durable)))
+
+        # What the history screen formats: the first page of a random
+        # account, and every page of the busiest one.
+        pages = [rng.choice(all_accounts) for _ in range(max(1, operations // 100))]
+        seconds = timed_runs(lambda: [[str(transaction) for transaction in
+                                       account.get_transaction_page(0, BankingApp.HISTORY_PAGE_SIZE)]
+                                      for account in pages], repeat)
+        results.append(suite_result("history_first_page", seconds, len(pages)))
+
+        busiest = max(bank.accounts, key=lambda account: len(account.get_transaction_history()))
+        seconds = timed_runs(lambda: [str(transaction) for transaction in busiest.get_transaction_history()],
+                             repeat)
+        results.append(suite_result("history_full", seconds, len(busiest.get_transaction_history())))
+        bank.close()
+
+        usernames = [f"user{rng.randrange(customers)}" for _ in range(logins)]
+        for cached in (False, True):
+            user_manager = UserManager(JsonUserStorage(users_file), parse_hasher(hasher_spec), 1,
+                                       cache_size=customers if cached else 0)
+            if cached:
+                for username in set(usernames):
+                    user_manager.authenticate(username, "password")
+            seconds = timed_runs(lambda: [user_manager.authenticate(username, "password")
+                                          for username in usernames], repeat)
+            user_manager.executor.shutdown()
+            results.append(suite_result("authenticate_cached" if cached else "authenticate", seconds, logins,
+                                        hasher=hasher_spec))
+    return results
+
+
+def compare_results(baseline, results):
+    # Lines suite results up with a saved run by operation; a ratio above 1
+    # means the operation got slower.
+    previous = {result["operation"]: result for result in baseline["results"] if result["benchmark"] == "suite"}
+    comparison = []
+    for result in results:
+        before = previous.get(result["operation"])
+        if before is not None:
+            comparison.append({
+                "benchmark": "compare",
+                "operation": result["operation"],
+                "baseline_us_per_op": before["us_per_op"],
+                "us_per_op": result["us_per_op"],
+                "ratio": result["us_per_op"] / before["us_per_op"]
+            })
+    return comparison
+
+
+def print_results(results):
+    for result in results:
+        fields = " ".join(
+            f"{key}={value:.6g}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items() if key != "benchmark"
+        )
+        print(f"{result['benchmark']:<10} {fields}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banking backend benchmarks")
+    parser.add_argument("--json", action="store_true", help="emit results as JSON")
+    parser.add_argument("--output", help="also write the results, arguments and environment (commit, Python, "
+                                         "CPU count) to this JSON file for comparison across commits")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="Bank.load_data time against data size")
+    startup.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    startup.add_argument("--transactions", type=int, default=20, help="transactions per account")
+    startup.add_argument("--repeat", type=int, default=3)
+
+    lookup = subparsers.add_parser("lookup", help="find_account/find_customer latency against bank size")
+    lookup.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="account counts; pass 10000000 for the full 10M run (needs several GB of RAM)")
+    lookup.add_argument("--lookups", type=int, default=100000)
+
+    memory = subparsers.add_parser("memory", help="peak parse overhead of the streaming loader vs json.load")
+    memory.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    memory.add_argument("--transactions", type=int, default=20, help="transactions per account")
+
+    transaction_bytes = subparsers.add_parser("transaction-bytes", help="memory per stored transaction")
+    transaction_bytes.add_argument("--count", type=int, default=1000000)
+
+    query = subparsers.add_parser("query", help="indexed date/type query vs a naive filter")
+    query.add_argument("--count", type=int, default=200000, help="transactions in the account")
+    query.add_argument("--queries", type=int, default=50)
+
+    transfers = subparsers.add_parser("transfers", help="concurrent transfer throughput and money conservation")
+    transfers.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    transfers.add_argument("--accounts", type=int, default=32)
+    transfers.add_argument("--transfers", type=int, default=20000, help="total transfers per run")
+    transfers.add_argument("--storage", choices=["none", "json", "sqlite"], default="none")
+
+    service = subparsers.add_parser("service", help="load-test the HTTP/JSON service with local clients")
+    service.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    service.add_argument("--requests", type=int, default=200, help="requests per client")
+    service.add_argument("--storage", choices=["none", "json", "sqlite"], default="json")
+
+    login = subparsers.add_parser("login", help="UserManager.authenticate throughput per hasher cost")
+    login.add_argument("--hashers", nargs="+",
+                       default=["sha256", "pbkdf2:100000", "pbkdf2:600000", "scrypt:16384:8:1", "scrypt:32768:8:1"],
+                       help="sha256, pbkdf2:<iterations> or scrypt:<n>:<r>:<p>")
+    login.add_argument("--users", type=int, default=20)
+    login.add_argument("--logins", type=int, default=40)
+    login.add_argument("--workers", type=int, default=4)
+
+    money = subparsers.add_parser("money", help="float vs Decimal vs integer-cents posting throughput")
+    money.add_argument("--postings", type=int, default=1000000)
+
+    reconcile = subparsers.add_parser("reconcile", help="parallel reconciliation throughput")
+    reconcile.add_argument("--customers", type=int, default=20000)
+    reconcile.add_argument("--transactions", type=int, default=50, help="transactions per account")
+    reconcile.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+
+    cache = subparsers.add_parser("cache", help="hit ratio and resident memory of the customer cache")
+    cache.add_argument("--customers", type=int, default=5000)
+    cache.add_argument("--cache-sizes", type=int, nargs="+", default=[100, 500, 1000, 5000])
+    cache.add_argument("--lookups", type=int, default=20000)
+    cache.add_argument("--hot", type=float, default=0.05, help="share of accounts receiving 90%% of lookups")
+    cache.add_argument("--storage", choices=["sqlite", "sharded"], default="sqlite")
+
+    generate = subparsers.add_parser("generate", help="write a synthetic bank_data.json and users.log")
+    generate.add_argument("directory")
+    generate.add_argument("--customers", type=int, default=1000)
+    generate.add_argument("--accounts", type=int, default=2, help="accounts per customer")
+    generate.add_argument("--transactions", type=int, default=50, help="average transactions per account")
+    generate.add_argument("--transfer-ratio", type=float, default=0.6, help="share of events that are transfers")
+    generate.add_argument("--hasher", default="pbkdf2:1000", help="password hasher for the generated users")
+    generate.add_argument("--seed", type=int, default=42)
+
+    suite = subparsers.add_parser("suite", help="load/save, find_account, transfers, history rendering and "
+                                                "authenticate on one generated dataset")
+    suite.add_argument("--customers", type=int, default=10000)
+    suite.add_argument("--accounts", type=int, default=2, help="accounts per customer")
+    suite.add_argument("--transactions", type=int, default=50, help="average transactions per account")
+    suite.add_argument("--transfer-ratio", type=float, default=0.6, help="share of events that are transfers")
+    suite.add_argument("--operations", type=int, default=100000, help="lookups and in-memory transfers per run")
+    suite.add_argument("--logins", type=int, default=50)
+    suite.add_argument("--hasher", default="pbkdf2:600000", help="sha256, pbkdf2:<iterations> or scrypt:<n>:<r>:<p>")
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--seed", type=int, default=42)
+    suite.add_argument("--baseline", help="a previous --output file to compare against")
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        results = bench_startup(args.sizes, args.transactions, args.repeat)
+    elif args.command == "lookup":
+        results = bench_lookup(args.sizes, args.lookups)
+    elif args.command == "memory":
+        results = bench_memory(args.sizes, args.transactions)
+    elif args.command == "transaction-bytes":
+        results = bench_transaction_bytes(args.count)
+    elif args.command == "query":
+        results = bench_query(args.count, args.queries)
+    elif args.command == "transfers":
+        results = bench_transfers(args.threads, args.accounts, args.transfers, args.storage)
+    elif args.command == "service":
+        results = bench_service(args.clients, args.requests, args.storage)
+    elif args.command == "login":
+        results = bench_login(args.hashers, args.users, args.logins, args.workers)
+    elif args.command == "money":
+        results = bench_money(args.postings)
+    elif args.command == "reconcile":
+        results = bench_reconcile(args.customers, args.transactions, args.processes)
+    elif args.command == "cache":
+        results = bench_cache(args.customers, args.cache_sizes, args.lookups, args.hot, args.storage)
+    elif args.command == "generate":
+        os.makedirs(args.directory, exist_ok=True)
+        summary = generate_dataset(os.path.join(args.directory, "bank_data.json"), args.customers,
+                                   args.transactions, args.accounts, args.transfer_ratio,
+                                   os.path.join(args.directory, "users.json"), parse_hasher(args.hasher),
+                                   args.seed)
+        results = [{"benchmark": "generate", **summary}]
+    elif args.command == "suite":
+        results = bench_suite(args.customers, args.accounts, args.transactions, args.transfer_ratio,
+                              args.operations, args.logins, args.hasher, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "arguments": vars(args), "results": results}, f, indent=2)
+    if getattr(args, "baseline", None):
+        with open(args.baseline) as f:
+            results = results + compare_results(json.load(f), results)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
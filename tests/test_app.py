@@ -0,0 +1,31 @@
+import os
+import sys
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+def test_wait_for_shows_errors_from_background_steps(monkeypatch):
+    shown = []
+    monkeypatch.setattr(app.messagebox, "showerror", lambda title, message: shown.append(message))
+    future = Future()
+    future.set_exception(KeyError("md5"))
+    called = []
+
+    app.BankingApp.wait_for(SimpleNamespace(), future, called.append)
+
+    assert shown == ["'md5'"]
+    assert called == []
+
+
+def test_wait_for_passes_results_on(monkeypatch):
+    future = Future()
+    future.set_result("C1")
+    called = []
+
+    app.BankingApp.wait_for(SimpleNamespace(), future, called.append)
+
+    assert called == ["C1"]
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Account, Bank, Customer, JsonStorage
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = Bank(JsonStorage(str(tmp_path / "bank_data.json"), str(tmp_path / "bank_journal.log")))
+    for number, balance in ((1, 0), (2, 500)):
+        customer = Customer(f"C{number}", "Name", "name@example.com", "555")
+        customer.add_account(Account(f"ACC-{number}", customer, balance))
+        bank.add_customer(customer)
+    yield bank
+    bank.close()
+
+
+def test_each_result_has_the_balance_after_its_posting(bank):
+    result = bank.post_batch([
+        {"action": "deposit", "account_number": "ACC-1", "amount": 1000},
+        {"action": "withdraw", "account_number": "ACC-1", "amount": 600},
+        {"action": "transfer", "account_number": "ACC-2", "recipient_account": "ACC-1", "amount": 200},
+    ])
+
+    assert result["applied"]
+    assert [item["balance"] for item in result["results"]] == [1000, 400, 300]
+    assert bank.find_account("ACC-1").balance == 600
+
+
+def test_unusable_postings_are_reported_per_item(bank):
+    result = bank.post_batch([
+        {"action": "deposit", "account_number": ["ACC-1"], "amount": 100},
+        {"action": "transfer", "account_number": "ACC-2", "recipient_account": {"n": 1}, "amount": 100},
+        "deposit",
+        {"action": "deposit", "account_number": "ACC-1", "amount": 100},
+    ])
+
+    assert not result["applied"]
+    assert [item["error"] for item in result["results"]] == [
+        "Account not found", "Recipient account not found", "Posting must be an object", None]
+    assert all("balance" not in item for item in result["results"])
+    assert bank.find_account("ACC-1").balance == 0
+
+
+def test_a_batch_that_cannot_be_persisted_is_rolled_back(bank, monkeypatch):
+    def fail(transactions):
+        raise OSError("disk full")
+    monkeypatch.setattr(bank.storage.journal, "append", fail)
+
+    with pytest.raises(OSError):
+        bank.post_batch([
+            {"action": "deposit", "account_number": "ACC-1", "amount": 1000},
+            {"action": "transfer", "account_number": "ACC-2", "recipient_account": "ACC-1", "amount": 200},
+        ])
+
+    for number, balance in (("ACC-1", 0), ("ACC-2", 500)):
+        account = bank.find_account(number)
+        assert account.balance == balance
+        assert len(account.transactions) == 0
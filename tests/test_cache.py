@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Account, Bank, Customer, JsonStorage, SQLiteStorage
+
+
+def make_database(tmp_path, count):
+    path = str(tmp_path / "bank.db")
+    bank = Bank(SQLiteStorage(path))
+    for number in range(count):
+        customer = Customer(f"C{number}", "Name", "name@example.com", "555")
+        customer.add_account(Account(f"ACC-{number}", customer, 1000))
+        bank.add_customer(customer)
+    bank.save_data()
+    bank.close()
+    return path
+
+
+def test_evictions_keep_customers_and_accounts_in_step(tmp_path):
+    bank = Bank(SQLiteStorage(make_database(tmp_path, 5), lazy=True), cache_size=2)
+    for number in range(5):
+        bank.find_account(f"ACC-{number}")
+
+    assert [customer.customer_id for customer in bank.customers] == ["C3", "C4"]
+    assert [account.account_number for account in bank.accounts] == ["ACC-3", "ACC-4"]
+    assert bank.cache_info()["evictions"] == 3
+    bank.close()
+
+
+def test_batch_touching_more_customers_than_the_cache_holds(tmp_path):
+    path = make_database(tmp_path, 5)
+    bank = Bank(SQLiteStorage(path, lazy=True), cache_size=2)
+    postings = [{"action": "deposit", "account_number": f"ACC-{number}", "amount": 5} for number in range(5)]
+
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(bank.post_batch(postings)), daemon=True)
+    worker.start()
+    worker.join(10)
+
+    assert not worker.is_alive()
+    assert result["applied"]
+    bank.close()
+    reloaded = Bank(SQLiteStorage(path, lazy=True))
+    assert [reloaded.find_account(f"ACC-{number}").balance for number in range(5)] == [1005] * 5
+    reloaded.close()
+
+
+def test_cache_needs_a_storage_that_evicts(tmp_path):
+    with pytest.raises(ValueError):
+        Bank(JsonStorage(str(tmp_path / "bank_data.json"), str(tmp_path / "bank_journal.log")), cache_size=10)
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Account, Bank, Customer, JsonStorage, TransactionJournal
+
+
+def open_bank(tmp_path):
+    return Bank(JsonStorage(str(tmp_path / "bank_data.json"), str(tmp_path / "bank_journal.log")))
+
+
+def test_appends_after_a_torn_tail_survive_restart(tmp_path):
+    bank = open_bank(tmp_path)
+    customer = Customer("C1", "Ada", "ada@example.com", "555")
+    customer.add_account(Account("ACC-1", customer, 0))
+    bank.add_customer(customer)
+    bank.deposit(bank.find_account("ACC-1"), 100)
+    bank.close()
+
+    # Simulated crash halfway through writing the next record.
+    with open(tmp_path / "bank_journal.log", "a") as f:
+        f.write('{"seq": 3, "amount_cents": 5')
+
+    bank = open_bank(tmp_path)
+    bank.deposit(bank.find_account("ACC-1"), 200)
+    bank.deposit(bank.find_account("ACC-1"), 300)
+    bank.close()
+
+    bank = open_bank(tmp_path)
+    account = bank.find_account("ACC-1")
+    assert account.balance == 600
+    assert len(account.transactions) == 3
+
+    bank.save_data()
+    bank.close()
+    assert open_bank(tmp_path).find_account("ACC-1").balance == 600
+
+
+def test_truncate_skips_lines_that_do_not_parse(tmp_path):
+    path = tmp_path / "journal.log"
+    records = [json.dumps({"seq": seq}) + "\n" for seq in (1, 2, 3)]
+    path.write_text(records[0] + '{"seq": 2, "amo' + records[1] + records[2])
+
+    journal = TransactionJournal(str(path))
+    assert [record["seq"] for record in journal.replay()] == [1, 3]
+    journal.truncate(1)
+    assert path.read_text() == records[2]
+
+
+def test_close_saves_pending_changes_and_stops_the_worker(tmp_path):
+    bank = Bank(JsonStorage(str(tmp_path / "bank_data.json"), str(tmp_path / "bank_journal.log"),
+                            save_delay=60, max_save_delay=60))
+    customer = Customer("C1", "Ada", "ada@example.com", "555")
+    customer.add_account(Account("ACC-1", customer, 0))
+    bank.add_customer(customer)
+    worker = bank.storage._saver._thread
+
+    bank.close()
+
+    assert not worker.is_alive()
+    assert json.loads((tmp_path / "bank_data.json").read_text())["customers"][0]["customer_id"] == "C1"
@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Account, Bank, Customer, JsonStorage, SQLiteStorage, reconcile_file
+
+
+def write_legacy_file(path, balance):
+    # The layout from before opening balances were stored.
+    path.write_text(json.dumps({"customers": [{
+        "customer_id": "C1", "name": "Ada", "email": "ada@example.com", "phone": "555",
+        "accounts": [{"account_number": "ACC-1", "balance": balance / 100, "account_type": "Savings",
+                      "transactions": [{"amount": 100.0, "transaction_type": "Deposit",
+                                        "timestamp": "2024-01-01T00:00:00", "account_number": "ACC-1",
+                                        "related_account": None}]}]
+    }]}))
+
+
+def test_legacy_mismatch_survives_a_load_and_save(tmp_path, capsys):
+    data_file = tmp_path / "bank_data.json"
+    journal_file = str(tmp_path / "bank_journal.log")
+    write_legacy_file(data_file, 50000)
+    assert not reconcile_file(str(data_file), journal_file, processes=1)["ok"]
+
+    bank = Bank(JsonStorage(str(data_file), journal_file))
+    assert "does not match its history" in capsys.readouterr().out
+    assert bank.find_account("ACC-1").balance == 50000
+    bank.save_data()
+    bank.close()
+
+    report = reconcile_file(str(data_file), journal_file, processes=1)
+    assert not report["ok"]
+    assert report["balance_mismatches"]
+
+
+def test_legacy_file_that_adds_up_loads_quietly(tmp_path, capsys):
+    data_file = tmp_path / "bank_data.json"
+    journal_file = str(tmp_path / "bank_journal.log")
+    write_legacy_file(data_file, 10000)
+
+    bank = Bank(JsonStorage(str(data_file), journal_file))
+    assert capsys.readouterr().out == ""
+    bank.save_data()
+    bank.close()
+    assert reconcile_file(str(data_file), journal_file, processes=1)["ok"]
+
+
+def test_sqlite_keeps_the_opening_balance(tmp_path, capsys):
+    path = str(tmp_path / "bank.db")
+    bank = Bank(SQLiteStorage(path))
+    customer = Customer("C1", "Ada", "ada@example.com", "555")
+    customer.add_account(Account("ACC-1", customer, 1000))
+    bank.add_customer(customer)
+    bank.deposit(bank.find_account("ACC-1"), 500)
+    bank.close()
+
+    for lazy in (False, True):
+        bank = Bank(SQLiteStorage(path, lazy=lazy))
+        account = bank.find_account("ACC-1")
+        assert account.balance == 1500
+        assert account.transactions.opening_balance == 1000
+        bank.close()
+    assert capsys.readouterr().out == ""
+
+
+def test_sqlite_reports_a_balance_its_history_does_not_explain(tmp_path, capsys):
+    path = str(tmp_path / "bank.db")
+    bank = Bank(SQLiteStorage(path))
+    customer = Customer("C1", "Ada", "ada@example.com", "555")
+    customer.add_account(Account("ACC-1", customer, 0))
+    bank.add_customer(customer)
+    bank.deposit(bank.find_account("ACC-1"), 500)
+    bank.close()
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE accounts SET balance_cents = 9999")
+
+    bank = Bank(SQLiteStorage(path))
+    assert bank.find_account("ACC-1").transactions.opening_balance == 0
+    assert "does not match its history" in capsys.readouterr().out
+    bank.close()
@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Account, Bank, Customer, ShardedStorage
+
+
+def open_storage(tmp_path, shards=2):
+    return ShardedStorage(str(tmp_path / "shards"), shards=shards, save_delay=60, max_save_delay=60)
+
+
+def ids_by_shard(storage, per_shard):
+    found = {shard: [] for shard in range(storage.shards)}
+    number = 0
+    while any(len(ids) < per_shard for ids in found.values()):
+        customer_id = f"C{number}"
+        ids = found[storage.shard_of(customer_id)]
+        if len(ids) < per_shard:
+            ids.append(customer_id)
+        number += 1
+    return found
+
+
+def add_customer(bank, customer_id, balance=1000):
+    customer = Customer(customer_id, "Name", "name@example.com", "555")
+    customer.add_account(Account(f"ACC-{customer_id}", customer, balance))
+    bank.add_customer(customer)
+
+
+def test_eviction_during_a_save_keeps_the_newer_shard(tmp_path):
+    storage = open_storage(tmp_path)
+    (first,), (second,) = ids_by_shard(storage, 1).values()
+    bank = Bank(storage, cache_size=1)
+    add_customer(bank, first)
+    add_customer(bank, second)
+    bank.deposit(bank.find_account(f"ACC-{first}"), 1)
+
+    # Hold the save between taking its snapshot and writing it, which is
+    # when an eviction could write a newer copy of the same shard.
+    writing = threading.Event()
+    write_shard = storage._write_shard
+
+    def slow_write_shard(*args, **kwargs):
+        writing.set()
+        time.sleep(0.3)
+        return write_shard(*args, **kwargs)
+    storage._write_shard = slow_write_shard
+    saver = threading.Thread(target=storage.save, args=(bank,))
+    saver.start()
+    writing.wait()
+    storage._write_shard = write_shard
+
+    bank.deposit(bank.find_account(f"ACC-{first}"), 500)
+    bank.find_customer(second)
+    saver.join()
+
+    assert bank.find_account(f"ACC-{first}").balance == 1501
+    bank.close()
+    assert Bank(open_storage(tmp_path)).find_account(f"ACC-{first}").balance == 1501
+
+
+def test_shards_loading_at_startup_are_not_evicted(tmp_path):
+    storage = open_storage(tmp_path)
+    first, second = ids_by_shard(storage, 4).values()
+    customer_ids = first + second[:2]
+    for customer_id in customer_ids:
+        customer = Customer(customer_id, "Name", "name@example.com", "555")
+        customer.add_account(Account(f"ACC-{customer_id}", customer, 1000))
+        storage.journal.append_records([{"customer": storage._customer_to_dict(customer)}])
+
+    # Every customer is only in the journal, so both shards replay it
+    # on load. The size check is bypassed to get a budget smaller than a
+    # shard, which is what used to evict one while it was half loaded.
+    storage = open_storage(tmp_path)
+    storage.largest_eviction_group = lambda: 0
+    bank = Bank(storage, cache_size=2)
+    assert all(bank.find_customer(customer_id) is not None for customer_id in customer_ids)
+    bank.save_data()
+    bank.close()
+
+    bank = Bank(open_storage(tmp_path))
+    assert all(bank.find_customer(customer_id) is not None for customer_id in customer_ids)
+
+
+def test_cache_smaller_than_a_shard_is_rejected(tmp_path):
+    storage = open_storage(tmp_path)
+    bank = Bank(storage)
+    for ids in ids_by_shard(storage, 3).values():
+        for customer_id in ids:
+            add_customer(bank, customer_id)
+    bank.save_data()
+    bank.close()
+
+    with pytest.raises(ValueError):
+        Bank(open_storage(tmp_path), cache_size=2)
+
+
+def test_exports_and_queries_cover_shards_that_are_not_loaded(tmp_path):
+    storage = open_storage(tmp_path, shards=4)
+    bank = Bank(storage)
+    customer_ids = [customer_id for ids in ids_by_shard(storage, 2).values() for customer_id in ids]
+    for customer_id in customer_ids:
+        add_customer(bank, customer_id)
+        bank.deposit(bank.find_account(f"ACC-{customer_id}"), 100)
+    bank.save_data()
+    # Newer postings are only in the journal.
+    for customer_id in customer_ids[:3]:
+        bank.deposit(bank.find_account(f"ACC-{customer_id}"), 7)
+    bank.close()
+
+    rows = list(open_storage(tmp_path, shards=4).iter_transactions())
+    assert sorted((row[0], row[3]) for row in rows) == sorted(
+        [(f"ACC-{customer_id}", 100) for customer_id in customer_ids]
+        + [(f"ACC-{customer_id}", 7) for customer_id in customer_ids[:3]])
+
+    bank = Bank(open_storage(tmp_path, shards=4), cache_size=2)
+    assert not bank.storage.all_resident()
+    assert len(bank.query_transactions(transaction_type="Deposit")) == len(customer_ids) + 3
+    bank.close()
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import JsonUserStorage, Pbkdf2Hasher, SQLiteStorage, UserManager
+
+
+class SlowHasher(Pbkdf2Hasher):
+    # Long enough that every registration gets past the early existence
+    # check before any of them writes.
+    def hash(self, password):
+        time.sleep(0.1)
+        return super().hash(password)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def user_storage(request, tmp_path):
+    if request.param == "json":
+        yield JsonUserStorage(str(tmp_path / "users.json"))
+    else:
+        storage = SQLiteStorage(str(tmp_path / "bank.db"))
+        yield storage
+        storage.close()
+
+
+def test_concurrent_registrations_of_one_name_admit_one(user_storage):
+    users = UserManager(user_storage, SlowHasher(iterations=1000), workers=4)
+    futures = [users.register_user_async("alice", f"password-{n}", f"C{n}") for n in range(4)]
+    results = [future.result() for future in futures]
+
+    assert results.count(True) == 1
+    winner = results.index(True)
+    assert user_storage.get_user("alice")["customer_id"] == f"C{winner}"
+    assert users.authenticate("alice", f"password-{winner}") == f"C{winner}"
+
+
+def test_bulk_registration_skips_taken_and_repeated_names(user_storage):
+    users = UserManager(user_storage, Pbkdf2Hasher(iterations=1000))
+    assert users.register_user("alice", "secret", "C1")
+
+    results = users.register_users([("alice", "other", "C9"), ("bob", "pw", "C2"), ("bob", "pw", "C3")])
+
+    assert results == [False, True, False]
+    assert user_storage.get_user("alice")["customer_id"] == "C1"
+    assert user_storage.get_user("bob")["customer_id"] == "C2"